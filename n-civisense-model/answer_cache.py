@@ -0,0 +1,65 @@
+import hashlib
+import re
+from typing import List, Optional
+
+from redis.asyncio import Redis
+
+from metrics import ANSWER_CACHE_LOOKUPS
+from session_store import timed
+
+_PUNCT = re.compile(r"[^\w\s]")
+_SPACE = re.compile(r"\s+")
+_CHUNK = re.compile(r"\S+\s*|\s+")
+
+
+def normalize(text: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a query."""
+    return _SPACE.sub(" ", _PUNCT.sub(" ", text.lower())).strip()
+
+
+def replay_chunks(text: str) -> List[str]:
+    """Split a cached answer into word-sized pieces for SSE replay."""
+    return _CHUNK.findall(text)
+
+
+class AnswerCache:
+    """Generated answers to first-turn questions, keyed by (context, normalized query).
+
+    Only used for queries that open a session, so the answer never depends on
+    earlier turns. Entries expire after ``ttl`` seconds.
+    """
+
+    PREFIX = "answer"
+
+    def __init__(self, client: Redis, ttl: int):
+        self.client = client
+        self.ttl = ttl
+
+    def key(self, ctx: str, text: str) -> str:
+        digest = hashlib.sha1(normalize(text).encode()).hexdigest()
+        return f"{self.PREFIX}:{ctx}:{digest}"
+
+    async def get(self, ctx: str, text: str) -> Optional[str]:
+        async with timed(self.client, "answer_get"):
+            data = await self.client.get(self.key(ctx, text))
+        ANSWER_CACHE_LOOKUPS.labels(context=ctx, result="hit" if data else "miss").inc()
+        return data.decode() if data else None
+
+    async def put(self, ctx: str, text: str, answer: str):
+        async with timed(self.client, "answer_put"):
+            await self.client.set(self.key(ctx, text), answer.encode(), ex=self.ttl)
+
+    async def invalidate(self, ctx: Optional[str] = None) -> int:
+        """Delete cached answers for one context, or all of them; returns the count."""
+        pattern = f"{self.PREFIX}:{ctx or '*'}:*"
+        deleted = 0
+        async with timed(self.client, "answer_invalidate"):
+            batch = []
+            async for key in self.client.scan_iter(match=pattern, count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    deleted += await self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.client.unlink(*batch)
+        return deleted
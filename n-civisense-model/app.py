@@ -1,37 +1,117 @@
 import os
 import json
-import time
 import asyncio
-import torch
-import tempfile
-from threading import Thread
-from contextlib import asynccontextmanager
-from typing import Dict, List, Tuple
-
-import redis
-import whisper
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import secrets
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import (
+    APIRouter,
+    FastAPI,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Request,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
-from transformers import (
-    AutoTokenizer,
-    AutoModelForCausalLM,
-    BitsAndBytesConfig,
-    TextIteratorStreamer,
+
+from backends import InferenceBackend, create_backend
+from limits import UploadLimit, spooled_route
+from metrics import (
+    ACTIVE_GENERATIONS,
+    DECODE_TOKEN_SECONDS,
+    GENERATION_TOKENS_PER_SECOND,
+    STAGE_LATENCY,
+    STT_RTF,
 )
-from rapidfuzz import fuzz
+from health import NotReady, Readiness, peak_rss_mb
+from history import SUMMARY_ROLE, PromptTooLong, fit_history
+from language_id import DEFAULT_PROFILE, LanguageIdentifier
+from scope import ScopeMatcher
+from answer_cache import AnswerCache, replay_chunks
+from codec import SessionCodec
+from session_store import SessionStore, create_redis
+from stt import AudioDecodeError, SpeechSegmenter, WhisperPool, WorkerCrashed, pcm16_to_float
+from worker import DeadlineExceeded, Generation, Overloaded
 
 # ==================== ENV CONFIG ====================
 MODEL_NAME = os.getenv("MODEL_NAME", "NCAIR1/N-ATLaS")
 HF_TOKEN = os.getenv("HF_TOKEN")
+MODEL_SNAPSHOT_DIR = os.getenv("MODEL_SNAPSHOT_DIR")
+MODEL_QUANTIZATION = os.getenv("MODEL_QUANTIZATION", "bnb4").lower()
 USE_REMOTE_INFERENCE = os.getenv("USE_REMOTE_INFERENCE", "false").lower() in ("1", "true")
+INFERENCE_BACKEND = os.getenv(
+    "INFERENCE_BACKEND", "remote" if USE_REMOTE_INFERENCE else "transformers"
+).lower()
 WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
-MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "2"))
+STT_BACKEND = os.getenv("STT_BACKEND", "whisper").lower()
+STT_DEVICE = os.getenv("STT_DEVICE", "cpu")
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "int8")
+STT_BEAM_SIZE = int(os.getenv("STT_BEAM_SIZE", "1"))
+STT_VAD_FILTER = os.getenv("STT_VAD_FILTER", "true").lower() in ("1", "true")
+WARMUP = os.getenv("WARMUP", "true").lower() in ("1", "true")
+WARMUP_TOKENS = int(os.getenv("WARMUP_TOKENS", "4"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))
+MAX_NEW_TOKENS = int(os.getenv("MAX_NEW_TOKENS", "128"))
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "4096"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "256"))
+MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "32"))
+GENERATION_TIMEOUT = float(os.getenv("GENERATION_TIMEOUT", "60"))
+STT_MAX_QUEUE = int(os.getenv("STT_MAX_QUEUE", "8"))
+STT_TIMEOUT = float(os.getenv("STT_TIMEOUT", "120"))
+STT_WORKERS = int(os.getenv("STT_WORKERS", "2"))
+STT_STREAM_VAD_THRESHOLD = float(os.getenv("STT_STREAM_VAD_THRESHOLD", "0.01"))
+STT_STREAM_SILENCE_MS = int(os.getenv("STT_STREAM_SILENCE_MS", "600"))
+STT_STREAM_MAX_SEGMENT = float(os.getenv("STT_STREAM_MAX_SEGMENT", "15"))
+STT_STREAM_PARTIAL_INTERVAL = float(os.getenv("STT_STREAM_PARTIAL_INTERVAL", "1.0"))
+STT_STREAM_MAX_PENDING = int(os.getenv("STT_STREAM_MAX_PENDING", "4"))
+STT_MAX_UPLOAD_BYTES = int(os.getenv("STT_MAX_UPLOAD_BYTES", str(25 << 20)))
 SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))
-
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+SESSION_CODEC = os.getenv("SESSION_CODEC", "msgpack+zstd")
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "86400"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+LANGID_PROFILE = os.getenv("LANGID_PROFILE", DEFAULT_PROFILE)
+LANGID_MIN_CONFIDENCE = float(os.getenv("LANGID_MIN_CONFIDENCE", "0.9"))
+DEFAULT_LANGUAGE = os.getenv("DEFAULT_LANGUAGE", "English")
+KV_CACHE_MAX_BYTES = int(os.getenv("KV_CACHE_MAX_BYTES", str(1 << 30)))
+
+LLAMA_MODEL_PATH = os.getenv("LLAMA_MODEL_PATH", "models/n-atlas.Q4_K_M.gguf")
+LLAMA_REPO_ID = os.getenv("LLAMA_REPO_ID")
+LLAMA_FILENAME = os.getenv("LLAMA_FILENAME")
+LLAMA_THREADS = int(os.getenv("LLAMA_THREADS", "0")) or None
+LLAMA_THREADS_BATCH = int(os.getenv("LLAMA_THREADS_BATCH", "0")) or None
+LLAMA_N_BATCH = int(os.getenv("LLAMA_N_BATCH", "512"))
+LLAMA_USE_MMAP = os.getenv("LLAMA_USE_MMAP", "true").lower() in ("1", "true")
+LLAMA_USE_MLOCK = os.getenv("LLAMA_USE_MLOCK", "false").lower() in ("1", "true")
+LLAMA_CACHE_BYTES = int(os.getenv("LLAMA_CACHE_BYTES", str(1 << 30)))
+
+REMOTE_INFERENCE_URLS = [u.strip() for u in os.getenv("REMOTE_INFERENCE_URLS", "").split(",") if u.strip()]
+REMOTE_MODEL = os.getenv("REMOTE_MODEL", MODEL_NAME)
+REMOTE_API_KEY = os.getenv("REMOTE_API_KEY")
+REMOTE_TIMEOUT = float(os.getenv("REMOTE_TIMEOUT", "60"))
+REMOTE_CONNECT_TIMEOUT = float(os.getenv("REMOTE_CONNECT_TIMEOUT", "2"))
+REMOTE_RETRIES = int(os.getenv("REMOTE_RETRIES", "2"))
+REMOTE_COOLDOWN = float(os.getenv("REMOTE_COOLDOWN", "5"))
+REMOTE_MAX_CONNECTIONS = int(os.getenv("REMOTE_MAX_CONNECTIONS", "64"))
+REMOTE_MAX_INFLIGHT = int(os.getenv("REMOTE_MAX_INFLIGHT", "64"))
+
+REDIS_URL = os.getenv("REDIS_URL")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "32"))
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "1.0"))
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES", "2"))
 
 # ==================== APP ====================
 app = FastAPI(title="N-ATLaS API", version="1.0")
@@ -41,47 +121,176 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadLimit, max_bytes=STT_MAX_UPLOAD_BYTES)
+
+redis_client = create_redis(
+    REDIS_URL,
+    REDIS_HOST,
+    REDIS_PORT,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_TIMEOUT,
+    retries=REDIS_RETRIES,
+)
+sessions = SessionStore(
+    redis_client,
+    ttl=SESSION_TTL,
+    max_messages=SESSION_MAX_MESSAGES,
+    codec=SessionCodec(SESSION_CODEC),
+)
+answers = AnswerCache(redis_client, ttl=ANSWER_CACHE_TTL)
+stt_pool = WhisperPool(
+    WHISPER_MODEL,
+    backend=STT_BACKEND,
+    workers=STT_WORKERS,
+    max_queue=STT_MAX_QUEUE,
+    # Engine options; reference Whisper ignores them.
+    device=STT_DEVICE,
+    compute_type=STT_COMPUTE_TYPE,
+    beam_size=STT_BEAM_SIZE,
+    vad_filter=STT_VAD_FILTER,
+)
+readiness = Readiness("llm", "stt")
+
+
+def build_backend(name: str) -> InferenceBackend:
+    if name == "llamacpp":
+        return create_backend(
+            "llamacpp",
+            model_path=LLAMA_MODEL_PATH,
+            repo_id=LLAMA_REPO_ID,
+            filename=LLAMA_FILENAME,
+            max_context=MAX_CONTEXT_TOKENS,
+            n_threads=LLAMA_THREADS,
+            n_threads_batch=LLAMA_THREADS_BATCH,
+            n_batch=LLAMA_N_BATCH,
+            use_mmap=LLAMA_USE_MMAP,
+            use_mlock=LLAMA_USE_MLOCK,
+            cache_bytes=LLAMA_CACHE_BYTES,
+            max_queue=MAX_QUEUE_SIZE,
+        )
+    if name == "remote":
+        return create_backend(
+            "remote",
+            urls=REMOTE_INFERENCE_URLS,
+            model=REMOTE_MODEL,
+            tokenizer_name=MODEL_NAME,
+            hf_token=HF_TOKEN,
+            api_key=REMOTE_API_KEY,
+            max_context=MAX_CONTEXT_TOKENS,
+            timeout=REMOTE_TIMEOUT,
+            connect_timeout=REMOTE_CONNECT_TIMEOUT,
+            retries=REMOTE_RETRIES,
+            cooldown=REMOTE_COOLDOWN,
+            max_connections=REMOTE_MAX_CONNECTIONS,
+            max_inflight=REMOTE_MAX_INFLIGHT,
+        )
+    return create_backend(
+        name,
+        model_name=MODEL_NAME,
+        hf_token=HF_TOKEN,
+        snapshot_dir=MODEL_SNAPSHOT_DIR,
+        quantization=MODEL_QUANTIZATION,
+        # Re-read on each refresh so edits to SYSTEM_PROMPTS rebuild the prefix cache.
+        system_prefixes=lambda: {ctx: system_header(ctx) for ctx in SYSTEM_PROMPTS},
+        max_context=MAX_CONTEXT_TOKENS,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_queue=MAX_QUEUE_SIZE,
+        kv_cache_bytes=KV_CACHE_MAX_BYTES,
+        session_ttl=SESSION_TTL,
+    )
 
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
-generation_semaphore = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
 
-# ==================== GLOBAL MODELS ====================
-tokenizer = None
-model = None
-stt_model = None
+backend = build_backend(INFERENCE_BACKEND)
 
-# ==================== LIFESPAN ====================
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global tokenizer, model, stt_model
 
-    tokenizer = AutoTokenizer.from_pretrained(
-        MODEL_NAME,
-        token=HF_TOKEN,
-        trust_remote_code=True,
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "queue_depth": exc.queue_depth},
+        headers={"Retry-After": "1", "X-Queue-Depth": str(exc.queue_depth)},
     )
 
-    if USE_REMOTE_INFERENCE:
-        raise RuntimeError("Remote inference flag enabled but no client implemented")
 
-    bnb = BitsAndBytesConfig(
-        load_in_4bit=True,
-        bnb_4bit_compute_dtype=torch.float16,
-        bnb_4bit_use_double_quant=True,
-    )
+@app.exception_handler(DeadlineExceeded)
+async def deadline_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.exception_handler(NotReady)
+async def not_ready_handler(request: Request, exc: NotReady):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
 
-    model = AutoModelForCausalLM.from_pretrained(
-        MODEL_NAME,
-        device_map="auto",
-        quantization_config=bnb,
-        torch_dtype=torch.float16,
-        token=HF_TOKEN,
-        trust_remote_code=True,
+@app.exception_handler(PromptTooLong)
+async def prompt_too_long_handler(request: Request, exc: PromptTooLong):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+# ==================== GLOBAL MODELS ====================
+max_context = MAX_CONTEXT_TOKENS
+
+# ==================== LIFESPAN ====================
+async def load_llm():
+    global max_context
+    await asyncio.to_thread(backend.load)
+    max_context = backend.max_context
+    backend.start()
+    return {"source": backend.source, "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+async def warm_llm():
+    # Pays for kernel selection and allocator growth before real traffic does.
+    seq = backend.submit(
+        format_chat([message("user", "Hello")], "NIMC"),
+        max_new_tokens=WARMUP_TOKENS,
+        timeout=GENERATION_TIMEOUT,
+        stop=STOP_SEQUENCES,
     )
+    await seq.text()
+
+
+async def load_stt():
+    stt_pool.start()
+    await stt_pool.wait_loaded(timeout=STT_TIMEOUT)
+    return {"backend": stt_pool.backend, "workers": stt_pool.workers}
 
-    stt_model = whisper.load_model(WHISPER_MODEL)
+
+async def warm_stt():
+    await stt_pool.warmup(timeout=STT_TIMEOUT)
+
+
+stt_restart: Optional[asyncio.Task] = None
+
+
+def restart_stt():
+    """Rebuild the Whisper pool after a worker process died.
+
+    "stt" reports loading meanwhile, so audio endpoints answer 503 and a
+    rebuild that fails turns /health/live red.
+    """
+    global stt_restart
+    if stt_restart is None or stt_restart.done():
+        stt_restart = asyncio.create_task(readiness.run("stt", load_stt, warm_stt if WARMUP else None))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load concurrently in the background so /health/live answers
+    # during startup; /health/ready turns 200 once both are loaded and warm.
+    startup = asyncio.gather(
+        readiness.run("llm", load_llm, warm_llm if WARMUP else None),
+        readiness.run("stt", load_stt, warm_stt if WARMUP else None),
+    )
     yield
 
+    startup.cancel()
+    if stt_restart is not None:
+        stt_restart.cancel()
+    backend.stop()
+    await backend.close()
+    stt_pool.stop()
+    await sessions.close()
+
 app.router.lifespan_context = lifespan
 
 # ==================== SCHEMA ====================
@@ -94,10 +303,12 @@ class ChatResponse(BaseModel):
     success: bool
     response: str
     detected_language: str
+    language_confidence: float = 0.0
     out_of_scope: bool
     matched_keywords: List[str]
     confidence: float
     latency_ms: int
+    cached: bool = False
 
 # ==================== SCOPE CONFIG ====================
 CATEGORY_KEYWORDS = {
@@ -106,60 +317,140 @@ CATEGORY_KEYWORDS = {
     "FRSC": ["driver", "license", "vehicle", "plate", "car"],
 }
 
+SYSTEM_PROMPTS = {
+    "NIMC": "You are a NIMC government service assistant.",
+    "FIRS": "You are a FIRS tax service assistant.",
+    "FRSC": "You are a FRSC road safety assistant.",
+}
+
 OUT_OF_SCOPE = "I can only help with NIMC, FIRS, and FRSC services."
+# Role markers of the chat template: the reply ends before the model starts another turn.
+STOP_SEQUENCES = ["<|user|>", "<|system|>", "<|assistant|>"]
+
+# Compiled once at import; rebuild it if CATEGORY_KEYWORDS changes.
+scope_matcher = ScopeMatcher(CATEGORY_KEYWORDS)
+language_identifier = LanguageIdentifier.load(LANGID_PROFILE)
 
 # ==================== HELPERS ====================
-def detect_language(_: str) -> str:
-    return "English"  # Placeholder
+def detect_language(text: str) -> Tuple[str, float]:
+    # Too little evidence (one short word, a bare acronym) falls back to the default.
+    lang, confidence = language_identifier.predict(text)
+    return (lang if confidence >= LANGID_MIN_CONFIDENCE else DEFAULT_LANGUAGE), round(confidence, 3)
 
 
 def is_query_in_scope(text: str) -> Tuple[bool, List[str], float]:
-    text_lower = text.lower()
-    matched = []
-    scores = []
+    return scope_matcher.match(text)
 
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        for kw in keywords:
-            if kw in text_lower:
-                matched.append(f"{category}:{kw}")
-                scores.append(1.0)
 
-    if matched:
-        return True, list(set(matched)), 100.0
+def system_header(ctx: str) -> str:
+    return f"<|system|>{SYSTEM_PROMPTS.get(ctx, SYSTEM_PROMPTS['NIMC'])}\n"
 
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        for kw in keywords:
-            score = fuzz.partial_ratio(kw, text_lower) / 100
-            if score >= 0.85:
-                matched.append(f"{category}:{kw}")
-                scores.append(score)
 
-    if matched:
-        return True, list(set(matched)), round(max(scores) * 100, 2)
+def render_message(m: Dict) -> str:
+    role = "system" if m["role"] == SUMMARY_ROLE else m["role"]
+    return f"<|{role}|>{m['content']}\n"
 
-    return False, [], 0.0
+
+def format_chat(msgs: List[Dict], ctx: str) -> str:
+    text = system_header(ctx)
+    for m in msgs:
+        text += render_message(m)
+    return text + "<|assistant|>"
 
 
-def get_session(sid: str) -> List[Dict]:
-    data = redis_client.get(sid)
-    return json.loads(data) if data else []
+@lru_cache(maxsize=64)
+def count_text_tokens(text: str) -> int:
+    return backend.count_tokens(text)
 
 
-def save_session(sid: str, msgs: List[Dict]):
-    redis_client.setex(sid, SESSION_TTL, json.dumps(msgs))
+def count_message_tokens(m: Dict) -> int:
+    return count_text_tokens(render_message(m))
 
 
-def format_chat(msgs: List[Dict], ctx: str) -> str:
-    system_prompts = {
-        "NIMC": "You are a NIMC government service assistant.",
-        "FIRS": "You are a FIRS tax service assistant.",
-        "FRSC": "You are a FRSC road safety assistant.",
-    }
+def message(role: str, content: str, count: bool = True) -> Dict:
+    m = {"role": role, "content": content}
+    if count:  # otherwise fit_history counts it the next time it is windowed
+        m["tokens"] = count_message_tokens(m)
+    return m
 
-    text = f"<|system|>{system_prompts.get(ctx, system_prompts['NIMC'])}\n"
-    for m in msgs:
-        text += f"<|{m['role']}|>{m['content']}\n"
-    return text + "<|assistant|>"
+
+def window_history(msgs: List[Dict], ctx: str) -> List[Dict]:
+    # Leave room for the system header, the assistant marker and the reply.
+    budget = (
+        max_context
+        - MAX_NEW_TOKENS
+        - count_text_tokens(system_header(ctx))
+        - count_text_tokens("<|assistant|>")
+        - 1
+    )
+    return fit_history(msgs, budget, count_message_tokens, summary_tokens=SUMMARY_MAX_TOKENS)
+
+
+async def record_turn(sid: str, msgs: List[Dict], reply: Dict, compacted: bool):
+    # msgs is the prompt window, ending with this turn's user message.
+    if not compacted:
+        await sessions.append(sid, [msgs[-1], reply])
+        return
+
+    summary = msgs[0] if msgs[0]["role"] == SUMMARY_ROLE else None
+    turns = len(msgs) - (1 if summary else 0)
+    await sessions.append(sid, [msgs[-1], reply], keep=turns + 1, summary=summary)
+
+# ==================== INSTRUMENTATION ====================
+@contextmanager
+def stage(name: str, endpoint: str, ctx: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=name, endpoint=endpoint, context=ctx).observe(time.perf_counter() - start)
+
+
+def observe_generation(seq: Generation, endpoint: str, ctx: str):
+    """Split a finished generation into queue wait, prefill, TTFT and decode rate."""
+    def observe(name: str, seconds: float):
+        STAGE_LATENCY.labels(stage=name, endpoint=endpoint, context=ctx).observe(seconds)
+
+    if seq.started_at is None:  # never left the queue
+        return
+    observe("queue_wait", seq.started_at - seq.submitted_at)
+    if seq.prefilled_at is not None:
+        observe("prefill", seq.prefilled_at - seq.started_at)
+    if seq.first_token_at is None:
+        return
+    observe("ttft", seq.first_token_at - seq.submitted_at)
+    if seq.tokens > 1:
+        DECODE_TOKEN_SECONDS.labels(endpoint=endpoint, context=ctx).observe(
+            (seq.last_token_at - seq.first_token_at) / (seq.tokens - 1)
+        )
+    elapsed = seq.last_token_at - seq.submitted_at
+    if elapsed > 0:
+        GENERATION_TOKENS_PER_SECOND.labels(endpoint=endpoint, context=ctx).observe(seq.tokens / elapsed)
+
+
+@contextmanager
+def generating(seq: Generation, endpoint: str, ctx: str):
+    active = ACTIVE_GENERATIONS.labels(endpoint=endpoint, context=ctx)
+    active.inc()
+    try:
+        yield
+    finally:
+        active.dec()
+        observe_generation(seq, endpoint, ctx)
+
+
+async def transcribe_audio(data, endpoint: str, ctx: str = "none") -> str:
+    try:
+        res = await stt_pool.transcribe(data, timeout=STT_TIMEOUT)
+    except WorkerCrashed:
+        restart_stt()
+        raise NotReady("stt")
+    labels = {"endpoint": endpoint, "context": ctx}
+    STAGE_LATENCY.labels(stage="stt_queue_wait", **labels).observe(max(res["wall_s"] - res["elapsed_s"], 0.0))
+    STAGE_LATENCY.labels(stage="transcribe", **labels).observe(res["elapsed_s"])
+    if res["audio_s"] > 0:
+        STT_RTF.labels(endpoint=endpoint, context=ctx, backend=stt_pool.backend).observe(res["elapsed_s"] / res["audio_s"])
+    return res["text"]
 
 # ==================== CHAT ====================
 @app.post("/chat", response_model=ChatResponse)
@@ -169,110 +460,343 @@ async def chat(req: ChatRequest):
     if req.context not in CATEGORY_KEYWORDS:
         req.context = "NIMC"
 
-    lang = detect_language(req.text)
-    ok, matched, confidence = is_query_in_scope(req.text)
+    with stage("language_id", "chat", req.context):
+        lang, lang_confidence = detect_language(req.text)
+    with stage("scope", "chat", req.context):
+        ok, matched, confidence = is_query_in_scope(req.text)
 
     if not ok:
         return ChatResponse(
             success=True,
             response=OUT_OF_SCOPE,
             detected_language=lang,
+            language_confidence=lang_confidence,
             out_of_scope=True,
             matched_keywords=[],
             confidence=0.0,
             latency_ms=int((time.time() - start) * 1000),
         )
 
-    msgs = get_session(req.session_id)
-    msgs.append({"role": "user", "content": req.text})
-
-    prompt = format_chat(msgs, req.context)
-    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    with stage("session_get", "chat", req.context):
+        history = await sessions.get(req.session_id)
+    first_turn = not history
+    with stage("answer_cache", "chat", req.context):
+        response = await answers.get(req.context, req.text) if first_turn else None
+    cached = response is not None
+
+    if cached:
+        # A first turn: nothing to window, and no tokenizer needed while the
+        # model is still loading.
+        history.append(message("user", req.text, count=False))
+        msgs = history
+    else:
+        readiness.require("llm")
+        # The transformers backend tokenizes the prompt inside submit().
+        with stage("tokenize", "chat", req.context):
+            history.append(message("user", req.text))
+            msgs = window_history(history, req.context)
+            seq = backend.submit(
+                format_chat(msgs, req.context),
+                max_new_tokens=MAX_NEW_TOKENS,
+                do_sample=True,
+                temperature=0.7,
+                timeout=GENERATION_TIMEOUT,
+                stop=STOP_SEQUENCES,
+                cache_key=req.session_id,
+            )
 
-    async with generation_semaphore:
         try:
-            with torch.no_grad():
-                out = model.generate(
-                    **inputs,
-                    max_new_tokens=128,
-                    do_sample=True,
-                    temperature=0.7,
-                )
+            with generating(seq, "chat", req.context):
+                response = await seq.text()
         except RuntimeError as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    decoded = tokenizer.decode(out[0], skip_special_tokens=True)
-    response = decoded.split("<|assistant|>")[-1].strip()
+        response = response.strip()
+        if first_turn and response:
+            await answers.put(req.context, req.text, response)
 
-    msgs.append({"role": "assistant", "content": response})
-    save_session(req.session_id, msgs)
+    with stage("session_save", "chat", req.context):
+        reply = message("assistant", response, count=not cached)
+        await record_turn(req.session_id, msgs, reply, msgs is not history)
 
     return ChatResponse(
         success=True,
         response=response,
         detected_language=lang,
+        language_confidence=lang_confidence,
         out_of_scope=False,
         matched_keywords=matched,
         confidence=confidence,
         latency_ms=int((time.time() - start) * 1000),
+        cached=cached,
     )
 
 # ==================== STREAMING ====================
 @app.post("/chat/stream")
 async def chat_stream(req: ChatRequest):
-    async def gen():
-        start = time.time()
-        yield f"data: {json.dumps({'type': 'meta'})}\n\n"
+    return await stream_chat(req, time.time(), "chat_stream")
+
+
+async def stream_chat(
+    req: ChatRequest,
+    start: float,
+    endpoint: str,
+    pending_history: Optional[asyncio.Task] = None,
+    preamble: Optional[List[Dict]] = None,
+) -> StreamingResponse:
+    """SSE reply shared by /chat/stream and /audio/chat/stream.
+
+    ``endpoint`` labels the latency metrics, ``pending_history`` is an
+    already started ``sessions.get`` for the session and ``preamble`` holds
+    events sent before ``meta``.
+    """
+    if req.context not in CATEGORY_KEYWORDS:
+        req.context = "NIMC"
+    ctx = req.context
 
+    with stage("scope", endpoint, ctx):
         ok, matched, confidence = is_query_in_scope(req.text)
+
+    # Admission happens before the response starts so a full queue is a 503.
+    seq = None
+    cached = None
+    if not ok and pending_history is not None:
+        pending_history.cancel()
+    if ok:
+        with stage("session_get", endpoint, ctx):
+            history = await (pending_history or sessions.get(req.session_id))
+        first_turn = not history
+        with stage("answer_cache", endpoint, ctx):
+            cached = await answers.get(req.context, req.text) if first_turn else None
+
+        if cached is not None:
+            history.append(message("user", req.text, count=False))
+            msgs = history
+        else:
+            readiness.require("llm")
+            with stage("tokenize", endpoint, ctx):
+                history.append(message("user", req.text))
+                msgs = window_history(history, req.context)
+                seq = backend.submit(
+                    format_chat(msgs, req.context),
+                    max_new_tokens=MAX_NEW_TOKENS,
+                    timeout=GENERATION_TIMEOUT,
+                    stop=STOP_SEQUENCES,
+                    cache_key=req.session_id,
+                )
+
+    async def gen():
+        for event in preamble or ():
+            yield f"data: {json.dumps(event)}\n\n"
+        yield f"data: {json.dumps({'type': 'meta', 'cached': cached is not None})}\n\n"
+
         if not ok:
             yield f"data: {json.dumps({'type': 'done', 'response': OUT_OF_SCOPE})}\n\n"
             return
 
-        msgs = get_session(req.session_id)
-        msgs.append({"role": "user", "content": req.text})
-        prompt = format_chat(msgs, req.context)
-
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-        streamer = TextIteratorStreamer(
-            tokenizer,
-            skip_special_tokens=True,
-            skip_prompt=True,
-        )
-
-        async with generation_semaphore:
-            t = Thread(
-                target=model.generate,
-                kwargs={**inputs, "streamer": streamer, "max_new_tokens": 128},
-            )
-            t.start()
+        if cached is not None:
+            for chunk in replay_chunks(cached):
+                yield f"data: {json.dumps({'type': 'token', 'text': chunk})}\n\n"
+            full = cached
+        else:
             full = ""
-            for tok in streamer:
-                full += tok
-                yield f"data: {json.dumps({'type': 'token', 'text': tok})}\n\n"
-                await asyncio.sleep(0)
-
-        msgs.append({"role": "assistant", "content": full})
-        save_session(req.session_id, msgs)
+            try:
+                with generating(seq, endpoint, ctx):
+                    async for tok in seq:
+                        full += tok
+                        yield f"data: {json.dumps({'type': 'token', 'text': tok})}\n\n"
+            except (DeadlineExceeded, RuntimeError) as e:
+                yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+                return
+            finally:
+                # Runs when the client disconnects mid-stream (the generator is
+                # cancelled or closed); a no-op once generation has finished.
+                seq.cancel()
+            if first_turn and full.strip():
+                await answers.put(req.context, req.text, full.strip())
+
+        with stage("session_save", endpoint, ctx):
+            reply = message("assistant", full, count=cached is None)
+            await record_turn(req.session_id, msgs, reply, msgs is not history)
         yield f"data: {json.dumps({'type': 'done', 'latency_ms': int((time.time()-start)*1000)})}\n\n"
 
-    return StreamingResponse(gen(), media_type="text/event-stream")
+    body = gen()
+    if seq is not None:
+        # A client that drops before the first chunk never starts gen().
+        weakref.finalize(body, seq.cancel)
+    return StreamingResponse(body, media_type="text/event-stream")
 
 # ==================== AUDIO ====================
-@app.post("/audio/transcribe")
+# Uploads are already capped by UploadLimit, so they stay in memory.
+audio_router = APIRouter(route_class=spooled_route(STT_MAX_UPLOAD_BYTES))
+
+
+@audio_router.post("/audio/transcribe")
 async def transcribe(file: UploadFile = File(...)):
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        tmp.write(await file.read())
-        tmp_path = tmp.name
+    readiness.require("stt")
+    try:
+        return {"text": await transcribe_audio(await file.read(), "transcribe")}
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.websocket("/audio/stream")
+async def transcribe_stream(ws: WebSocket):
+    """Incremental transcription of a live recording.
+
+    The client sends binary frames of 16 kHz mono 16-bit little-endian PCM
+    and a text frame ``{"type": "end"}`` when recording stops. The server
+    answers with ``partial`` events for the segment being spoken, a ``final``
+    event per segment closed by the VAD, and ``done`` with the full text.
+    """
+    await ws.accept()
+    if not readiness.is_ready("stt"):
+        await ws.close(code=1013, reason="Model 'stt' is still loading")
+        return
+
+    segmenter = SpeechSegmenter(
+        threshold=STT_STREAM_VAD_THRESHOLD,
+        silence_ms=STT_STREAM_SILENCE_MS,
+        max_segment_s=STT_STREAM_MAX_SEGMENT,
+        partial_every_s=STT_STREAM_PARTIAL_INTERVAL,
+    )
+    # Bounded: when segments close faster than they are transcribed, reading
+    # from the socket pauses until the transcriber catches up.
+    jobs: asyncio.Queue = asyncio.Queue(maxsize=STT_STREAM_MAX_PENDING)
+    finals: Dict[int, str] = {}
 
+    async def transcriber() -> bool:
+        # Jobs run in arrival order; a partial is skipped once its segment closed.
+        try:
+            while True:
+                job = await jobs.get()
+                if job is None:
+                    return True
+                kind, seg_id, audio = job
+                if kind == "partial" and (seg_id < segmenter.index or not jobs.empty()):
+                    continue
+                try:
+                    text = (await transcribe_audio(audio, "audio_stream")).strip()
+                except (Overloaded, DeadlineExceeded) as e:
+                    await ws.send_json({"type": "error", "segment": seg_id, "detail": str(e)})
+                    continue
+                except Exception as e:
+                    await ws.send_json({"type": "error", "segment": seg_id, "detail": str(e)})
+                    await ws.close(code=1011)
+                    return False
+                if kind == "final":
+                    finals[seg_id] = text
+                await ws.send_json({"type": kind, "segment": seg_id, "text": text})
+        finally:
+            # Wake a receive loop blocked on a full queue.
+            while not jobs.empty():
+                jobs.get_nowait()
+
+    async def enqueue(job) -> bool:
+        if worker.done():
+            return False
+        await jobs.put(job)
+        return True
+
+    worker = asyncio.create_task(transcriber())
     try:
-        res = stt_model.transcribe(tmp_path)
-        return {"text": res["text"]}
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+            if msg.get("bytes"):
+                for seg_id, audio in segmenter.feed(pcm16_to_float(msg["bytes"])):
+                    if not await enqueue(("final", seg_id, audio)):
+                        return
+                partial = segmenter.partial()
+                if partial is not None and jobs.empty():
+                    jobs.put_nowait(("partial", *partial))
+            elif msg.get("text") and json.loads(msg["text"]).get("type") == "end":
+                break
+
+        for seg_id, audio in segmenter.flush():
+            if not await enqueue(("final", seg_id, audio)):
+                return
+        if not await enqueue(None) or not await worker:
+            return
+        text = " ".join(finals[k] for k in sorted(finals) if finals[k])
+        await ws.send_json({"type": "done", "text": text})
+        await ws.close()
+    except WebSocketDisconnect:
+        pass
     finally:
-        os.unlink(tmp_path)
+        worker.cancel()
+
+@audio_router.post("/audio/chat/stream")
+async def audio_chat_stream(
+    file: UploadFile = File(...),
+    session_id: str = Form(...),
+    context: str = Form("NIMC"),
+):
+    """Voice query to streamed answer in one request; the transcript is the first event."""
+    start = time.time()
+    readiness.require("stt")
+    if context not in CATEGORY_KEYWORDS:
+        context = "NIMC"
+
+    # Session history loads from Redis while the audio is being transcribed.
+    pending_history = asyncio.create_task(sessions.get(session_id))
+    try:
+        text = await transcribe_audio(await file.read(), "audio_chat_stream", context)
+    except AudioDecodeError as e:
+        pending_history.cancel()
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        pending_history.cancel()
+        raise
+
+    text = text.strip()
+    lang, lang_confidence = detect_language(text)
+    transcript = {
+        "type": "transcript",
+        "text": text,
+        "detected_language": lang,
+        "language_confidence": lang_confidence,
+        "latency_ms": int((time.time() - start) * 1000),
+    }
+    req = ChatRequest(text=text, context=context, session_id=session_id)
+    return await stream_chat(req, start, "audio_chat_stream", pending_history, preamble=[transcript])
+
+
+app.include_router(audio_router)
+
+# ==================== HEALTH ====================
+@app.get("/health/live")
+async def health_live():
+    # Only a failed model load makes the process unhealthy; loading is not.
+    status = 503 if readiness.failed else 200
+    return JSONResponse(status_code=status, content={"alive": status == 200})
+
+
+@app.get("/health/ready")
+async def health_ready():
+    report = readiness.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
 
 # ==================== SESSION ====================
 @app.delete("/session/{sid}")
 async def clear_session(sid: str):
-    redis_client.delete(sid)
+    await sessions.clear(sid)
+    backend.evict(sid)
     return {"success": True}
+
+# ==================== ADMIN ====================
+@app.delete("/admin/answer-cache")
+async def invalidate_answer_cache(
+    context: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None),
+):
+    # Constant-time comparison; bytes because compare_digest rejects non-ASCII str.
+    if not ADMIN_TOKEN or not secrets.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    deleted = await answers.invalidate(context)
+    return {"success": True, "deleted": deleted}
+
+# ==================== METRICS ====================
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,20 @@
+from backends.base import InferenceBackend
+
+BACKENDS = ("transformers", "llamacpp", "remote")
+
+
+def create_backend(name: str, **kwargs) -> InferenceBackend:
+    """Instantiate a backend by name; engine libraries are imported only when selected."""
+    if name == "transformers":
+        from backends.transformers_backend import TransformersBackend
+
+        return TransformersBackend(**kwargs)
+    if name == "llamacpp":
+        from backends.llamacpp_backend import LlamaCppBackend
+
+        return LlamaCppBackend(**kwargs)
+    if name == "remote":
+        from backends.remote_backend import RemoteBackend
+
+        return RemoteBackend(**kwargs)
+    raise ValueError(f"Unknown INFERENCE_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
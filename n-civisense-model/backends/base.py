@@ -0,0 +1,49 @@
+from typing import Hashable, Optional, Sequence
+
+from worker import Generation
+
+
+class InferenceBackend:
+    """Text generation engine behind /chat and /chat/stream.
+
+    ``load`` does the heavy, blocking model setup during startup; ``start``
+    and ``stop`` manage any worker threads. ``submit`` queues a prompt and
+    returns a ``Generation`` straight away, raising ``Overloaded`` when the
+    backend cannot accept more work. Generation ends at EOS or before the
+    first of the ``stop`` strings, which never reaches the client.
+    """
+
+    name = "base"
+    max_context: int = 4096
+    # Where the weights were loaded from, reported on /health/ready.
+    source: Optional[str] = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    async def close(self):
+        """Release async resources (HTTP pools) on shutdown."""
+
+    def count_tokens(self, text: str) -> int:
+        raise NotImplementedError
+
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int = 128,
+        temperature: float = 1.0,
+        do_sample: bool = False,
+        timeout: Optional[float] = None,
+        cache_key: Optional[Hashable] = None,
+        stop: Sequence[str] = (),
+    ) -> Generation:
+        raise NotImplementedError
+
+    def evict(self, cache_key: Hashable):
+        """Forget any per-session state kept for ``cache_key``."""
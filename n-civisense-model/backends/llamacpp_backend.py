@@ -0,0 +1,164 @@
+import os
+import queue
+import threading
+import time
+from typing import Hashable, List, Optional, Sequence
+
+from backends.base import InferenceBackend
+from metrics import GENERATION_CANCELLED, GENERATION_CANCELLED_TOKENS
+from worker import DeadlineExceeded, Generation, Overloaded
+
+
+class LlamaCppBackend(InferenceBackend):
+    """GGUF model on CPU through ``llama-cpp-python``.
+
+    Weights are memory-mapped, so startup does not copy the model into RAM
+    and several workers on one host share the page cache. A llama.cpp
+    context is not thread-safe, so one worker thread drains a bounded queue
+    and streams each completion token by token; throughput comes from
+    llama.cpp's own multi-threaded kernels (``n_threads``).
+    """
+
+    name = "llamacpp"
+
+    def __init__(
+        self,
+        model_path: Optional[str],
+        repo_id: Optional[str] = None,
+        filename: Optional[str] = None,
+        max_context: int = 4096,
+        n_threads: Optional[int] = None,
+        n_threads_batch: Optional[int] = None,
+        n_batch: int = 512,
+        use_mmap: bool = True,
+        use_mlock: bool = False,
+        cache_bytes: int = 0,
+        max_queue: int = 32,
+    ):
+        self.model_path = model_path
+        self.repo_id = repo_id
+        self.filename = filename
+        self.max_context = max_context
+        self.n_threads = n_threads or os.cpu_count()
+        self.n_threads_batch = n_threads_batch or self.n_threads
+        self.n_batch = n_batch
+        self.use_mmap = use_mmap
+        self.use_mlock = use_mlock
+        self.cache_bytes = cache_bytes
+        self.llm = None
+
+        self._jobs: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="llamacpp-worker", daemon=True)
+
+    def load(self):
+        try:
+            from llama_cpp import Llama, LlamaRAMCache
+        except ImportError:
+            raise RuntimeError("INFERENCE_BACKEND=llamacpp requires the 'llama-cpp-python' package")
+
+        kwargs = dict(
+            n_ctx=self.max_context,
+            n_threads=self.n_threads,
+            n_threads_batch=self.n_threads_batch,
+            n_batch=self.n_batch,
+            n_gpu_layers=0,
+            use_mmap=self.use_mmap,
+            use_mlock=self.use_mlock,
+            verbose=False,
+        )
+        if self.model_path and os.path.exists(self.model_path):
+            self.llm = Llama(model_path=self.model_path, **kwargs)
+            self.source = "local"
+        elif self.repo_id and self.filename:
+            self.llm = Llama.from_pretrained(repo_id=self.repo_id, filename=self.filename, **kwargs)
+            self.source = "hub"
+        else:
+            raise RuntimeError(
+                f"GGUF model not found at {self.model_path!r} and no LLAMA_REPO_ID/LLAMA_FILENAME set"
+            )
+
+        if self.cache_bytes:
+            # Keeps llama.cpp states for recent prompts, so a follow-up turn
+            # only evaluates the tokens after the longest cached prefix.
+            self.llm.set_cache(LlamaRAMCache(capacity_bytes=self.cache_bytes))
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread.is_alive():
+            return
+        try:
+            self._jobs.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=5)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.llm.tokenize(text.encode(), add_bos=False, special=True))
+
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int = 128,
+        temperature: float = 1.0,
+        do_sample: bool = False,
+        timeout: Optional[float] = None,
+        cache_key: Optional[Hashable] = None,
+        stop: Sequence[str] = (),
+    ) -> Generation:
+        gen = Generation(time.monotonic() + timeout if timeout else None)
+        try:
+            self._jobs.put_nowait((gen, prompt, max_new_tokens, temperature if do_sample else 0.0, list(stop)))
+        except queue.Full:
+            raise Overloaded(self._jobs.qsize())
+        return gen
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+
+            gen, prompt, max_new_tokens, temperature, stop = job
+            if gen.cancelled:
+                gen.bridge.close()
+                continue
+            if gen.expired():
+                gen.bridge.fail(DeadlineExceeded())
+                continue
+
+            try:
+                self._generate(gen, prompt, max_new_tokens, temperature, stop)
+            except Exception as e:
+                gen.bridge.fail(e)
+
+    def _generate(self, gen: Generation, prompt: str, max_new_tokens: int, temperature: float, stop: List[str]):
+        produced = 0
+        gen.started_at = time.perf_counter()
+        # llama.cpp holds back partial stop matches and ends at the first full one.
+        stream = self.llm.create_completion(
+            prompt,
+            max_tokens=max_new_tokens,
+            temperature=temperature,
+            stop=stop,
+            stream=True,
+        )
+        for chunk in stream:
+            text = chunk["choices"][0]["text"]
+            produced += 1
+            gen.count_token()
+            if text:
+                gen.bridge.put(text)
+
+            if gen.cancelled:
+                GENERATION_CANCELLED.inc()
+                GENERATION_CANCELLED_TOKENS.inc(max(max_new_tokens - produced, 0))
+                break
+            if gen.expired():
+                stream.close()
+                gen.bridge.fail(DeadlineExceeded())
+                return
+
+        stream.close()
+        gen.bridge.close()
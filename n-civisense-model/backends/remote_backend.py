@@ -0,0 +1,217 @@
+import asyncio
+import functools
+import json
+import time
+import warnings
+from typing import Hashable, List, Optional, Sequence
+
+import httpx
+
+from backends.base import InferenceBackend
+from metrics import GENERATION_CANCELLED, GENERATION_CANCELLED_TOKENS
+from worker import DeadlineExceeded, Generation, Overloaded
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class UpstreamError(RuntimeError):
+    def __init__(self, url: str, detail: str):
+        super().__init__(f"Remote inference failed at {url}: {detail}")
+
+
+class _Upstream:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.inflight = 0
+        self.down_until = 0.0
+
+
+class _RemoteGeneration(Generation):
+    task: Optional[asyncio.Task] = None
+
+    def cancel(self):
+        super().cancel()
+        if self.task is not None:
+            self.task.cancel()
+
+
+class RemoteBackend(InferenceBackend):
+    """Generation on OpenAI-compatible servers (vLLM, llama.cpp server, TGI).
+
+    Requests go to ``/completions`` with ``stream=True`` over one pooled
+    keep-alive ``httpx.AsyncClient`` and tokens are relayed as they arrive.
+    Each request picks the healthy upstream with the fewest in-flight
+    requests; an upstream that fails to connect or answers 429/5xx is skipped
+    for ``cooldown`` seconds and the request is retried elsewhere, up to
+    ``retries`` times. Retries only happen before the first token, so a
+    stream is never duplicated. Prompt token counts for history budgeting use
+    the model's tokenizer locally.
+    """
+
+    name = "remote"
+    source = "remote"
+
+    def __init__(
+        self,
+        urls: List[str],
+        model: str,
+        tokenizer_name: Optional[str] = None,
+        hf_token: Optional[str] = None,
+        api_key: Optional[str] = None,
+        max_context: int = 4096,
+        timeout: float = 60.0,
+        connect_timeout: float = 2.0,
+        retries: int = 2,
+        cooldown: float = 5.0,
+        max_connections: int = 64,
+        max_inflight: int = 64,
+    ):
+        if not urls:
+            raise ValueError("INFERENCE_BACKEND=remote requires REMOTE_INFERENCE_URLS")
+        self.upstreams = [_Upstream(url) for url in urls]
+        self.model = model
+        self.tokenizer_name = tokenizer_name
+        self.hf_token = hf_token
+        self.api_key = api_key
+        self.max_context = max_context
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.cooldown = cooldown
+        self.max_connections = max_connections
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.tokenizer = None
+        self.client: Optional[httpx.AsyncClient] = None
+
+    def load(self):
+        if not self.tokenizer_name:
+            return
+        try:
+            from transformers import AutoTokenizer
+
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                self.tokenizer_name,
+                token=self.hf_token,
+                trust_remote_code=True,
+            )
+        except (ImportError, OSError) as e:
+            warnings.warn(f"Tokenizer {self.tokenizer_name!r} unavailable ({e}); estimating token counts")
+
+    def start(self):
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else None
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+    def count_tokens(self, text: str) -> int:
+        if self.tokenizer is None:
+            # Rough upper bound for BPE vocabularies when no tokenizer is available.
+            return len(text.encode()) // 3 + 1
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int = 128,
+        temperature: float = 1.0,
+        do_sample: bool = False,
+        timeout: Optional[float] = None,
+        cache_key: Optional[Hashable] = None,
+        stop: Sequence[str] = (),
+    ) -> Generation:
+        if self.inflight >= self.max_inflight:
+            raise Overloaded(self.inflight)
+
+        gen = _RemoteGeneration(time.monotonic() + timeout if timeout else None)
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": max_new_tokens,
+            "temperature": temperature if do_sample else 0.0,
+            "stream": True,
+        }
+        if stop:
+            # OpenAI-compatible servers stop before these and leave them out of the text.
+            payload["stop"] = list(stop)
+        self.inflight += 1
+        gen.task = asyncio.create_task(self._run(gen, payload, timeout))
+        # A callback rather than a finally in _run: it also fires for a task
+        # cancelled before it ever started running.
+        gen.task.add_done_callback(functools.partial(self._finished, gen, payload["max_tokens"]))
+        return gen
+
+    async def _run(self, gen: _RemoteGeneration, payload: dict, timeout: Optional[float]):
+        async def relay():
+            gen.started_at = time.perf_counter()
+            async for text in self._stream(payload):
+                gen.count_token()
+                gen.bridge.put(text)
+
+        try:
+            await asyncio.wait_for(relay(), timeout)
+            gen.bridge.close()
+        except asyncio.TimeoutError:
+            gen.bridge.fail(DeadlineExceeded())
+        except Exception as e:
+            gen.bridge.fail(e)
+
+    def _finished(self, gen: _RemoteGeneration, max_tokens: int, task: asyncio.Task):
+        self.inflight -= 1
+        if task.cancelled():
+            GENERATION_CANCELLED.inc()
+            GENERATION_CANCELLED_TOKENS.inc(max(max_tokens - gen.tokens, 0))
+            gen.bridge.close()
+
+    def _pick(self, tried: List[_Upstream]) -> _Upstream:
+        now = time.monotonic()
+        candidates = [u for u in self.upstreams if u not in tried] or self.upstreams
+        healthy = [u for u in candidates if u.down_until <= now] or candidates
+        return min(healthy, key=lambda u: u.inflight)
+
+    async def _stream(self, payload: dict):
+        tried: List[_Upstream] = []
+        for attempt in range(self.retries + 1):
+            upstream = self._pick(tried)
+            tried.append(upstream)
+            started = False
+            upstream.inflight += 1
+            try:
+                async with self.client.stream(
+                    "POST", f"{upstream.url}/completions", json=payload
+                ) as resp:
+                    if resp.status_code in RETRY_STATUS and attempt < self.retries:
+                        raise UpstreamError(upstream.url, f"HTTP {resp.status_code}")
+                    if resp.status_code != 200:
+                        body = (await resp.aread()).decode(errors="replace")[:200]
+                        raise RuntimeError(f"Remote inference returned {resp.status_code}: {body}")
+
+                    async for line in resp.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            return
+                        text = json.loads(data)["choices"][0].get("text")
+                        if text:
+                            started = True
+                            yield text
+                    return
+            except (httpx.TransportError, UpstreamError) as e:
+                if started:
+                    raise UpstreamError(upstream.url, f"stream interrupted: {e}")
+                upstream.down_until = time.monotonic() + self.cooldown
+                if attempt == self.retries:
+                    raise UpstreamError(upstream.url, str(e) or type(e).__name__)
+                await asyncio.sleep(min(0.05 * 2 ** attempt, 1.0))
+            finally:
+                upstream.inflight -= 1
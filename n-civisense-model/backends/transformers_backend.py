@@ -0,0 +1,208 @@
+import json
+import os
+import time
+import warnings
+from typing import Callable, Dict, FrozenSet, Hashable, Optional, Sequence, Tuple
+
+import torch
+import transformers
+from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+
+from backends.base import InferenceBackend
+from kv_cache import PrefixCache, StaticPrefixCache
+from scheduler import BatchScheduler
+from worker import Generation
+
+
+SNAPSHOT_META = "snapshot.json"
+QUANTIZATIONS = ("bnb4", "bnb8", "fp16", "fp32")
+
+
+def quantization_config(quantization: str) -> Optional[BitsAndBytesConfig]:
+    if quantization == "bnb4":
+        return BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=torch.float16,
+            bnb_4bit_use_double_quant=True,
+        )
+    if quantization == "bnb8":
+        return BitsAndBytesConfig(load_in_8bit=True)
+    return None
+
+
+def load_quantized(model_name: str, hf_token: Optional[str], quantization: str = "bnb4"):
+    """Load full-precision weights and quantize them (bitsandbytes 4/8-bit) or cast them to fp16/fp32."""
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization!r}; expected one of {', '.join(QUANTIZATIONS)}")
+
+    return AutoModelForCausalLM.from_pretrained(
+        model_name,
+        device_map="auto",
+        quantization_config=quantization_config(quantization),
+        torch_dtype=torch.float32 if quantization == "fp32" else torch.float16,
+        token=hf_token,
+        trust_remote_code=True,
+    )
+
+
+def export_snapshot(model_name: str, hf_token: Optional[str], out_dir: str) -> Dict:
+    """Quantize ``model_name`` once and save weights and tokenizer to ``out_dir``.
+
+    Weights are written as safetensors with the bitsandbytes settings in the
+    saved config, so loading the directory skips quantization entirely.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model_name, token=hf_token, trust_remote_code=True)
+    model = load_quantized(model_name, hf_token)
+
+    os.makedirs(out_dir, exist_ok=True)
+    model.save_pretrained(out_dir, safe_serialization=True, max_shard_size="2GB")
+    tokenizer.save_pretrained(out_dir)
+
+    meta = {
+        "model_name": model_name,
+        "quantization": "bnb-4bit",
+        "transformers": transformers.__version__,
+        "created": int(time.time()),
+    }
+    with open(os.path.join(out_dir, SNAPSHOT_META), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def snapshot_for(snapshot_dir: Optional[str], model_name: str) -> Optional[str]:
+    """Return ``snapshot_dir`` if it holds an exported snapshot of ``model_name``."""
+    if not snapshot_dir:
+        return None
+    path = os.path.join(snapshot_dir, SNAPSHOT_META)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        meta = json.load(f)
+    if meta.get("model_name") != model_name:
+        warnings.warn(
+            f"Snapshot in {snapshot_dir} is for {meta.get('model_name')!r}, not {model_name!r}; ignoring it"
+        )
+        return None
+    return snapshot_dir
+
+
+class TransformersBackend(InferenceBackend):
+    """Hugging Face model behind the continuous-batching scheduler.
+
+    ``quantization`` (bitsandbytes ``bnb4`` by default, ``bnb8``, ``fp16``
+    or ``fp32``) applies when loading from the hub; a snapshot is loaded as
+    it was exported.
+    """
+
+    name = "transformers"
+
+    def __init__(
+        self,
+        model_name: str,
+        hf_token: Optional[str],
+        system_prefixes: Callable[[], Dict[str, str]],
+        max_context: int = 4096,
+        max_batch_size: int = 8,
+        max_queue: int = 32,
+        kv_cache_bytes: int = 1 << 30,
+        session_ttl: Optional[float] = None,
+        snapshot_dir: Optional[str] = None,
+        quantization: str = "bnb4",
+    ):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown MODEL_QUANTIZATION {quantization!r}; expected one of {', '.join(QUANTIZATIONS)}")
+        self.model_name = model_name
+        self.snapshot_dir = snapshot_dir
+        self.quantization = quantization
+        self.source: Optional[str] = None
+        self.hf_token = hf_token
+        self.max_context = max_context
+        self.max_batch_size = max_batch_size
+        self.max_queue = max_queue
+        self.session_cache = PrefixCache("session", max_bytes=kv_cache_bytes, ttl=session_ttl)
+        # Rebuilt by the scheduler whenever the system prompt table changes.
+        self.system_cache = StaticPrefixCache("system", system_prefixes)
+        self.tokenizer = None
+        self.model = None
+        self.scheduler: Optional[BatchScheduler] = None
+        self._stop_ids: Dict[Tuple[str, ...], FrozenSet[int]] = {}
+
+    def load(self):
+        snapshot = snapshot_for(self.snapshot_dir, self.model_name)
+        self.source = "snapshot" if snapshot else "hub"
+
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            snapshot or self.model_name,
+            token=self.hf_token,
+            trust_remote_code=True,
+        )
+
+        if snapshot:
+            # Already quantized: the saved config carries the bitsandbytes
+            # settings and safetensors shards are memory-mapped, not copied.
+            self.model = AutoModelForCausalLM.from_pretrained(
+                snapshot,
+                device_map="auto",
+                torch_dtype=torch.float16,
+                local_files_only=True,
+                trust_remote_code=True,
+            )
+        else:
+            self.model = load_quantized(self.model_name, self.hf_token, self.quantization)
+
+        self.max_context = min(
+            self.max_context,
+            getattr(self.model.config, "max_position_embeddings", self.max_context),
+        )
+
+    def start(self):
+        self.scheduler = BatchScheduler(
+            self.model,
+            self.tokenizer,
+            max_batch_size=self.max_batch_size,
+            max_queue=self.max_queue,
+            session_cache=self.session_cache,
+            system_cache=self.system_cache,
+        )
+        self.scheduler.start()
+
+    def stop(self):
+        if self.scheduler is not None:
+            self.scheduler.stop()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int = 128,
+        temperature: float = 1.0,
+        do_sample: bool = False,
+        timeout: Optional[float] = None,
+        cache_key: Optional[Hashable] = None,
+        stop: Sequence[str] = (),
+    ) -> Generation:
+        return self.scheduler.submit(
+            self.tokenizer(prompt)["input_ids"],
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            do_sample=do_sample,
+            timeout=timeout,
+            cache_key=cache_key,
+            stop=stop,
+            stop_ids=self.stop_ids(tuple(stop)),
+        )
+
+    def stop_ids(self, stop: Tuple[str, ...]) -> FrozenSet[int]:
+        """Token ids of stop strings the tokenizer keeps as one (often special) token.
+
+        Special tokens vanish from decoded text, so these are matched by id.
+        """
+        if stop not in self._stop_ids:
+            ids = [self.tokenizer(s, add_special_tokens=False)["input_ids"] for s in stop]
+            self._stop_ids[stop] = frozenset(i[0] for i in ids if len(i) == 1)
+        return self._stop_ids[stop]
+
+    def evict(self, cache_key: Hashable):
+        self.session_cache.evict(cache_key)
@@ -0,0 +1,226 @@
+"""Decode performance of real models across backends, quantizations and batch sizes.
+
+Each configuration loads in a fresh interpreter through the same backend
+classes the service uses, runs the NIMC/FIRS/FRSC prompts from
+``benchmarks/prompts.py`` in the service's chat template, and reports load
+time, peak memory, prefill and decode tokens/s and TTFT. Transformers
+configurations run once per ``--batch-sizes`` entry with that many
+concurrent requests in the continuous batch; a llama.cpp context serves
+one request at a time, so GGUF files run once per ``--threads`` entry.
+Without CUDA the bitsandbytes variants are skipped and ``--cpu-model``
+(a small stand-in) runs in fp32. Run from the n-civisense-model directory:
+
+    python -m benchmarks.decode --transformers bnb4 bnb8 fp16 --batch-sizes 1 4 8 \\
+        --gguf models/n-atlas.Q4_K_M.gguf models/n-atlas.Q5_K_M.gguf --threads 4 8 \\
+        --csv decode.csv --json decode.json
+
+A GGUF entry is a local path or ``repo_id:filename`` on the Hugging Face hub.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.prompts import QUESTIONS
+from health import peak_rss_mb
+
+FIELDS = [
+    "backend", "variant", "model", "device", "threads", "batch_size",
+    "load_s", "peak_rss_mb", "peak_gpu_mb", "requests", "prompt_tokens", "generated_tokens",
+    "ttft_ms", "prefill_tok_s", "decode_tok_s", "decode_tok_s_per_seq", "error",
+]
+
+
+# ==================== CHILD ====================
+def build(spec: Dict):
+    if spec["backend"] == "llamacpp":
+        from backends.llamacpp_backend import LlamaCppBackend
+
+        path, repo_id, filename = spec["variant"], None, None
+        if not os.path.exists(path) and ":" in path:
+            repo_id, filename = path.split(":", 1)
+        return LlamaCppBackend(
+            model_path=path,
+            repo_id=repo_id,
+            filename=filename,
+            max_context=spec["max_context"],
+            n_threads=spec["threads"] or None,
+            n_threads_batch=spec["threads"] or None,
+        )
+
+    import torch
+    from backends.transformers_backend import TransformersBackend
+
+    if spec["threads"]:
+        torch.set_num_threads(spec["threads"])
+    return TransformersBackend(
+        spec["model"],
+        os.getenv("HF_TOKEN"),
+        # No system-prompt prefix cache: every prompt is prefilled in full.
+        system_prefixes=dict,
+        max_context=spec["max_context"],
+        max_batch_size=max(spec["batch_sizes"]),
+        max_queue=max(spec["batch_sizes"]),
+        quantization=spec["variant"],
+    )
+
+
+async def measure(backend, prompts: List[str], batch_size: int, rounds: int, max_new_tokens: int, stop: List[str]) -> Dict:
+    gens, prompt_tokens = [], []
+    decode_tokens, decode_s = 0, 0.0
+    for r in range(rounds):
+        batch = [prompts[(r * batch_size + i) % len(prompts)] for i in range(batch_size)]
+        prompt_tokens += [backend.count_tokens(p) for p in batch]
+        round_gens = [backend.submit(p, max_new_tokens=max_new_tokens, stop=stop) for p in batch]
+        await asyncio.gather(*[g.text() for g in round_gens])
+        gens += round_gens
+
+        # Whole-batch decode throughput: tokens after each first token over the round's decode span.
+        started = [g for g in round_gens if g.tokens > 1]
+        if started:
+            decode_tokens += sum(g.tokens - 1 for g in started)
+            decode_s += max(g.last_token_at for g in started) - min(g.first_token_at for g in started)
+
+    # llama.cpp and remote upstreams have no separate prefill stamp; their first token marks it.
+    prefill_s = sum((g.prefilled_at or g.first_token_at) - g.started_at for g in gens if g.first_token_at)
+    per_seq = [(g.tokens - 1) / (g.last_token_at - g.first_token_at) for g in gens if g.tokens > 1]
+    ttft = [(g.first_token_at - g.submitted_at) * 1000 for g in gens if g.first_token_at]
+    return {
+        "requests": len(gens),
+        "prompt_tokens": round(statistics.mean(prompt_tokens), 1),
+        "generated_tokens": sum(g.tokens for g in gens),
+        "ttft_ms": round(statistics.median(ttft), 1) if ttft else None,
+        "prefill_tok_s": round(sum(prompt_tokens) / prefill_s, 1) if prefill_s else None,
+        "decode_tok_s": round(decode_tokens / decode_s, 1) if decode_s else None,
+        "decode_tok_s_per_seq": round(statistics.median(per_seq), 1) if per_seq else None,
+    }
+
+
+async def run_child(spec: Dict):
+    from app import STOP_SEQUENCES, format_chat
+
+    backend = build(spec)
+    start = time.perf_counter()
+    await asyncio.to_thread(backend.load)
+    load_s = round(time.perf_counter() - start, 2)
+
+    prompts = [format_chat([{"role": "user", "content": q}], ctx) for ctx, q in QUESTIONS]
+    batch_sizes = spec["batch_sizes"] if spec["backend"] == "transformers" else [1]
+    for batch_size in batch_sizes:
+        backend.max_batch_size = batch_size
+        backend.start()
+        try:
+            await measure(backend, prompts[:1], 1, 1, 8, STOP_SEQUENCES)  # warmup
+            row = await measure(backend, prompts, batch_size, spec["rounds"], spec["max_new_tokens"], STOP_SEQUENCES)
+        finally:
+            backend.stop()
+        print(json.dumps({**spec_row(spec), "batch_size": batch_size, "load_s": load_s, **memory(), **row}), flush=True)
+
+
+def memory() -> Dict:
+    gpu = None
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            gpu = round(torch.cuda.max_memory_allocated() / (1 << 20), 1)
+    except ImportError:
+        pass
+    return {"peak_rss_mb": round(peak_rss_mb(), 1), "peak_gpu_mb": gpu}
+
+
+# ==================== PARENT ====================
+def spec_row(spec: Dict) -> Dict:
+    return {k: spec[k] for k in ("backend", "variant", "model", "device", "threads")}
+
+
+def has_cuda() -> bool:
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def run_spec(spec: Dict) -> List[Dict]:
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.decode", "--child", json.dumps(spec)],
+        capture_output=True, text=True,
+    )
+    rows = [json.loads(line) for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]
+        rows.append({**spec_row(spec), "error": error})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "NCAIR1/N-ATLaS"))
+    parser.add_argument("--cpu-model", default="HuggingFaceTB/SmolLM2-135M-Instruct",
+                        help="stand-in for --model when no CUDA device is present")
+    parser.add_argument("--transformers", nargs="*", metavar="QUANT",
+                        help="bnb4 bnb8 fp16 fp32 (default: bnb4 bnb8 fp16 on CUDA, fp32 on CPU)")
+    parser.add_argument("--gguf", nargs="*", default=[], metavar="PATH|REPO:FILE")
+    parser.add_argument("--threads", nargs="+", type=int, default=[0], help="CPU threads, 0 for all cores")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--rounds", type=int, default=2, help="batches per configuration and batch size")
+    parser.add_argument("--max-new-tokens", type=int, default=int(os.getenv("MAX_NEW_TOKENS", "128")))
+    parser.add_argument("--max-context", type=int, default=int(os.getenv("MAX_CONTEXT_TOKENS", "4096")))
+    parser.add_argument("--csv")
+    parser.add_argument("--json")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(run_child(json.loads(args.child)))
+        return
+
+    cuda = has_cuda()
+    device = "cuda" if cuda else "cpu"
+    model = args.model if cuda else args.cpu_model
+    quants = args.transformers if args.transformers is not None else (["bnb4", "bnb8", "fp16"] if cuda else ["fp32"])
+    common = dict(
+        batch_sizes=args.batch_sizes,
+        rounds=args.rounds,
+        max_new_tokens=args.max_new_tokens,
+        max_context=args.max_context,
+    )
+
+    specs = []
+    for quant in quants:
+        # On a GPU the thread count doesn't matter for transformers.
+        for threads in args.threads if not cuda else [0]:
+            specs.append({"backend": "transformers", "variant": quant, "model": model, "device": device,
+                          "threads": threads, **common})
+    for gguf in args.gguf:
+        for threads in args.threads:
+            specs.append({"backend": "llamacpp", "variant": gguf, "model": os.path.basename(gguf),
+                          "device": "cpu", "threads": threads, **common})
+
+    rows = []
+    for spec in specs:
+        if spec["variant"].startswith("bnb") and not cuda:
+            rows.append({**spec_row(spec), "error": "skipped: bitsandbytes needs a CUDA device"})
+            continue
+        rows += run_spec(spec)
+
+    print(json.dumps(rows, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows({k: row.get(k) for k in FIELDS} for row in rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Accuracy and per-query latency of the language identifier.
+
+Classifies every line of the labelled test set (data/langid/test.tsv),
+prints per-language accuracy and the confusions, then times ``predict`` over
+many repetitions. As in the service, a prediction below ``--min-confidence``
+counts as the ``default`` label, which the test set uses for bare keywords
+and acronyms that carry no evidence of a language. Run from the
+n-civisense-model directory:
+
+    python -m benchmarks.language_id --min-accuracy 0.9 --max-p99-us 500
+
+With either threshold the script exits non-zero when it is not met.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from language_id import DATA_DIR, LanguageIdentifier, read_tsv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--test-set", default=os.path.join(DATA_DIR, "test.tsv"))
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--min-confidence", type=float, default=float(os.getenv("LANGID_MIN_CONFIDENCE", "0.9")))
+    parser.add_argument("--min-accuracy", type=float)
+    parser.add_argument("--max-p99-us", type=float)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    identifier = LanguageIdentifier.load()
+    load_ms = (time.perf_counter() - start) * 1000
+    samples = read_tsv(args.test_set)
+
+    correct, total, confusions = Counter(), Counter(), Counter()
+    for label, text in samples:
+        predicted, confidence = identifier.predict(text)
+        if confidence < args.min_confidence:
+            predicted = "default"
+        total[label] += 1
+        correct[label] += predicted == label
+        if predicted != label:
+            confusions[f"{label}->{predicted}"] += 1
+
+    timings = []
+    for _ in range(args.repeat):
+        for _, text in samples:
+            t = time.perf_counter()
+            identifier.predict(text)
+            timings.append((time.perf_counter() - t) * 1e6)
+    timings.sort()
+
+    def pct(p: float) -> float:
+        return round(timings[min(len(timings) - 1, int(p * len(timings)))], 1)
+
+    accuracy = sum(correct.values()) / len(samples)
+    report = {
+        "samples": len(samples),
+        "accuracy": round(accuracy, 4),
+        "per_language": {label: round(correct[label] / total[label], 4) for label in sorted(total)},
+        "confusions": dict(confusions),
+        "load_ms": round(load_ms, 1),
+        "latency_us": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)},
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.min_accuracy is not None and accuracy < args.min_accuracy:
+        sys.exit(f"accuracy {accuracy:.3f} below {args.min_accuracy}")
+    if args.max_p99_us is not None and report["latency_us"]["p99"] > args.max_p99_us:
+        sys.exit(f"p99 {report['latency_us']['p99']}us above {args.max_p99_us}us")
+
+
+if __name__ == "__main__":
+    main()
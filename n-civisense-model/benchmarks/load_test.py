@@ -0,0 +1,338 @@
+"""Load test of the model service without model weights, a GPU or Redis.
+
+The app runs in-process under uvicorn. A deterministic byte-level tokenizer
+and fake causal LM sit behind the real continuous-batching scheduler, an
+in-process fakeredis replaces Redis, and a fake STT engine (sleeping
+``--stt-rtf`` x the clip length) runs in the real Whisper process pool, so
+queueing, batching, session storage and streaming are exercised as in
+production. Uploads go through the real ffmpeg decode when ffmpeg is on
+PATH; otherwise the fake workers read the WAV in-process. Each endpoint is
+driven at ``--concurrency`` for ``--requests`` requests and the script
+prints throughput, time to first token and latency percentiles as JSON.
+Needs ``fakeredis``. Run from the n-civisense-model directory:
+
+    python -m benchmarks.load_test --concurrency 16 --requests 200 --token-ms 20
+
+The script exits non-zero when any request failed or, with --max-p99-ms,
+when an endpoint's p99 latency is above it.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import wave
+from collections import Counter
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+
+import stt
+from benchmarks.prompts import QUESTIONS
+from kv_cache import cache_to_tuples
+from stt import SAMPLE_RATE, WhisperPool
+
+ENDPOINTS = ("chat", "chat_stream", "transcribe")
+REPLY = b"Please visit the nearest office with a valid ID and your reference number. "
+
+
+# ==================== FAKE MODELS ====================
+class FakeTokenizer:
+    """One token per UTF-8 byte, so token counts are exact and free."""
+
+    eos_token_id = None
+
+    def __call__(self, text: str, add_special_tokens: bool = True) -> Dict:
+        return {"input_ids": list(text.encode())}
+
+    def decode(self, ids: List[int], skip_special_tokens: bool = True) -> str:
+        return bytes(ids).decode(errors="replace")
+
+
+class FakeModel:
+    """Deterministic stand-in for a causal LM with a configurable cost.
+
+    A decode step takes ``token_ms`` whatever the batch size, as on a
+    memory-bound GPU; a prefill takes ``prefill_us`` per prompt token. The
+    predicted token is the next byte of ``REPLY`` for the position, and the
+    KV cache is one scalar per position so the scheduler's cache handling
+    runs unchanged.
+    """
+
+    device = torch.device("cpu")
+
+    def __init__(self, token_ms: float, prefill_us: float, max_context: int):
+        self.token_ms = token_ms
+        self.prefill_us = prefill_us
+        self.generation_config = SimpleNamespace(eos_token_id=None, top_k=1)
+        self.config = SimpleNamespace(max_position_embeddings=max_context)
+
+    def __call__(self, input_ids, attention_mask=None, position_ids=None, past_key_values=None, use_cache=True):
+        batch, n = input_ids.shape
+        past = cache_to_tuples(past_key_values) if past_key_values is not None else None
+        past_len = past[0][0].shape[2] if past else 0
+
+        # The scheduler passes position_ids on decode steps only.
+        decoding = position_ids is not None
+        time.sleep(self.token_ms / 1000 if decoding else self.prefill_us * n / 1e6)
+
+        kv = torch.zeros(batch, 1, n, 1)
+        if past:
+            kv = [(torch.cat([k, kv], dim=2), torch.cat([v, kv], dim=2)) for k, v in past]
+        else:
+            kv = [(kv, kv)]
+
+        positions = position_ids[:, -1].tolist() if decoding else [past_len + n - 1] * batch
+        logits = torch.zeros(batch, n, 256)
+        for row, pos in enumerate(positions):
+            logits[row, -1, REPLY[(pos + 1) % len(REPLY)]] = 100.0
+        return SimpleNamespace(logits=logits, past_key_values=kv)
+
+
+class FakeEngine:
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+    def transcribe(self, audio) -> str:
+        time.sleep(self.rtf * len(audio) / SAMPLE_RATE)
+        return "How do I get my NIN slip?"
+
+
+def decode_wav(data: bytes, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Stand-in for ``stt.decode_audio`` reading the 16 kHz mono WAV of ``wav_bytes``."""
+    with wave.open(io.BytesIO(data)) as w:
+        frames = w.readframes(w.getnframes())
+    return np.frombuffer(frames, np.int16).astype(np.float32) / 32768.0
+
+
+def _init_fake_stt(rtf: float, ffmpeg: bool):
+    stt._engine = FakeEngine(rtf)
+    if not ffmpeg:
+        stt.decode_audio = decode_wav
+
+
+class FakeWhisperPool(WhisperPool):
+    """The real process pool with ``FakeEngine`` in every worker.
+
+    Uploads are decoded by ffmpeg as in production when it is installed,
+    else in-process by ``decode_wav``.
+    """
+
+    def __init__(self, rtf: float, **kwargs):
+        super().__init__("fake", **kwargs)
+        self.backend = "fake"
+        self.rtf = rtf
+        self.ffmpeg = shutil.which("ffmpeg") is not None
+
+    def start(self):
+        self._spawn(_init_fake_stt, (self.rtf, self.ffmpeg))
+
+
+def wav_bytes(seconds: float) -> bytes:
+    n = int(seconds * SAMPLE_RATE)
+    samples = (int(8000 * math.sin(2 * math.pi * 440 * i / SAMPLE_RATE)) for i in range(n))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(b"".join(s.to_bytes(2, "little", signed=True) for s in samples))
+    return buf.getvalue()
+
+
+# ==================== SERVER ====================
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def build_app(args):
+    # app reads its configuration at import time.
+    os.environ.update(
+        INFERENCE_BACKEND="transformers",
+        MAX_BATCH_SIZE=str(args.batch_size),
+        MAX_NEW_TOKENS=str(args.max_new_tokens),
+        MAX_QUEUE_SIZE=str(args.max_queue),
+        STT_WORKERS=str(args.stt_workers),
+        STT_MAX_QUEUE=str(args.max_queue),
+    )
+    import fakeredis
+    import app as service
+
+    def load():
+        service.backend.tokenizer = FakeTokenizer()
+        service.backend.model = FakeModel(args.token_ms, args.prefill_us, service.backend.max_context)
+        service.backend.source = "fake"
+
+    service.backend.load = load
+    service.stt_pool = FakeWhisperPool(args.stt_rtf, workers=args.stt_workers, max_queue=args.max_queue)
+    redis = fakeredis.FakeAsyncRedis()
+    service.sessions.client = redis
+    service.answers.client = redis
+    return service.app
+
+
+# ==================== CLIENT ====================
+def pct(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))], 1)
+
+
+def summarize(values: List[float]) -> Dict:
+    return {"p50": pct(values, 0.50), "p95": pct(values, 0.95), "p99": pct(values, 0.99), "max": pct(values, 1.0)}
+
+
+def chat_body(i: int) -> Dict:
+    ctx, text = QUESTIONS[i % len(QUESTIONS)]
+    # A unique question per request, so the answer cache never short-circuits generation.
+    return {"text": f"{text} (request {i})", "context": ctx, "session_id": f"load-{i}"}
+
+
+async def send_chat(client, i: int, audio: bytes):
+    r = await client.post("/chat", json=chat_body(i))
+    return r.status_code, None
+
+
+async def send_chat_stream(client, i: int, audio: bytes):
+    start = time.perf_counter()
+    ttft = None
+    async with client.stream("POST", "/chat/stream", json=chat_body(i)) as r:
+        if r.status_code != 200:
+            return r.status_code, None
+        async for line in r.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if event["type"] == "token" and ttft is None:
+                ttft = time.perf_counter() - start
+            elif event["type"] == "error":
+                return "stream_error", ttft
+    return 200, ttft
+
+
+async def send_transcribe(client, i: int, audio: bytes):
+    r = await client.post("/audio/transcribe", files={"file": ("query.wav", audio, "audio/wav")})
+    return r.status_code, None
+
+
+SENDERS: Dict[str, Callable] = {
+    "chat": send_chat,
+    "chat_stream": send_chat_stream,
+    "transcribe": send_transcribe,
+}
+
+
+async def drive(client, endpoint: str, requests: int, concurrency: int, audio: bytes) -> Dict:
+    send = SENDERS[endpoint]
+    latencies, ttfts = [], []
+    statuses: Counter = Counter()
+    next_id = iter(range(requests))
+
+    async def user():
+        for i in next_id:
+            start = time.perf_counter()
+            try:
+                status, ttft = await send(client, i, audio)
+            except Exception as e:
+                status, ttft = type(e).__name__, None
+            statuses[status] += 1
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+                if ttft is not None:
+                    ttfts.append(ttft * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[user() for _ in range(concurrency)])
+    duration = time.perf_counter() - start
+
+    report = {
+        "requests": requests,
+        "ok": statuses.pop(200, 0),
+        "errors": {str(k): v for k, v in statuses.items()},
+        "duration_s": round(duration, 2),
+        "requests_per_s": round(len(latencies) / duration, 2),
+        "latency_ms": summarize(latencies),
+    }
+    if endpoint == "chat_stream":
+        report["ttft_ms"] = summarize(ttfts)
+    return report
+
+
+async def run(args, base_url: str) -> Dict:
+    import httpx
+
+    audio = wav_bytes(args.audio_s)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        deadline = time.monotonic() + args.timeout
+        while (await client.get("/health/ready")).status_code != 200:
+            if time.monotonic() > deadline:
+                raise RuntimeError("service did not become ready")
+            await asyncio.sleep(0.2)
+        return {
+            endpoint: await drive(client, endpoint, args.requests, args.concurrency, audio)
+            for endpoint in args.endpoints
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--token-ms", type=float, default=20.0, help="fake decode step time")
+    parser.add_argument("--prefill-us", type=float, default=50.0, help="fake prefill time per prompt token")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=256)
+    parser.add_argument("--stt-workers", type=int, default=2)
+    parser.add_argument("--stt-rtf", type=float, default=0.1, help="fake transcription time / audio length")
+    parser.add_argument("--audio-s", type=float, default=3.0, help="length of the uploaded clip")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    port = args.port or free_port()
+    server = uvicorn.Server(uvicorn.Config(build_app(args), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    try:
+        results = asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "port", "max_p99_ms")}
+    config["stt_decode"] = "ffmpeg" if shutil.which("ffmpeg") else "wav"
+    report = {"config": config, "endpoints": results}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = {name: r["errors"] for name, r in results.items() if r["errors"]}
+    if failed:
+        sys.exit(f"failed requests: {failed}")
+    if args.max_p99_ms is not None:
+        slow = {name: r["latency_ms"]["p99"] for name, r in results.items() if r["latency_ms"]["p99"] > args.max_p99_ms}
+        if slow:
+            sys.exit(f"p99 above {args.max_p99_ms}ms: {slow}")
+
+
+if __name__ == "__main__":
+    main()
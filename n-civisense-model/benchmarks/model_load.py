@@ -0,0 +1,63 @@
+"""Cold-start cost of loading the chat model from the hub vs a local snapshot.
+
+Each mode loads in a fresh interpreter so peak RSS is not shared between
+runs. ``hub`` downloads/reads full-precision weights and quantizes them;
+``snapshot`` loads the directory written by export_snapshot.py. Run from the
+n-civisense-model directory:
+
+    python -m benchmarks.model_load --snapshot snapshots/n-atlas-bnb4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from health import peak_rss_mb
+
+
+def child(mode: str, model: str, snapshot: str):
+    from backends.transformers_backend import TransformersBackend
+
+    backend = TransformersBackend(
+        model,
+        os.getenv("HF_TOKEN"),
+        system_prefixes=dict,
+        snapshot_dir=snapshot if mode == "snapshot" else None,
+    )
+    start = time.perf_counter()
+    backend.load()
+    print(json.dumps({
+        "mode": mode,
+        "source": backend.source,
+        "load_s": round(time.perf_counter() - start, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "NCAIR1/N-ATLaS"))
+    parser.add_argument("--snapshot", default=os.getenv("MODEL_SNAPSHOT_DIR") or "snapshots/n-atlas-bnb4")
+    parser.add_argument("--modes", nargs="+", default=["hub", "snapshot"], choices=["hub", "snapshot"])
+    parser.add_argument("--child", choices=["hub", "snapshot"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.model, args.snapshot)
+        return
+
+    results = []
+    for mode in args.modes:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.model_load", "--child", mode,
+             "--model", args.model, "--snapshot", args.snapshot],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
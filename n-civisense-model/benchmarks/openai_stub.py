@@ -0,0 +1,69 @@
+"""Minimal OpenAI-compatible completion server for exercising the remote backend.
+
+Streams ``--tokens`` fake tokens per request with ``--delay-ms`` between them,
+and answers a ``--fail-rate`` fraction of requests with HTTP 503 so retries
+and failover can be observed. Run two and point the API at both:
+
+    python -m benchmarks.openai_stub --port 9001 &
+    python -m benchmarks.openai_stub --port 9002 --fail-rate 0.5 &
+    INFERENCE_BACKEND=remote \\
+    REMOTE_INFERENCE_URLS=http://localhost:9001/v1,http://localhost:9002/v1 \\
+    uvicorn app:app
+"""
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def create_app(tokens: int = 32, delay_ms: float = 20.0, fail_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="OpenAI stub")
+    app.state.requests = 0
+
+    @app.post("/v1/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if random.random() < fail_rate:
+            return JSONResponse(status_code=503, content={"error": "stub overloaded"})
+
+        n = min(tokens, int(body.get("max_tokens", tokens)))
+
+        def chunk(text: str, finish=None) -> str:
+            choice = {"index": 0, "text": text, "finish_reason": finish}
+            return f"data: {json.dumps({'object': 'text_completion', 'choices': [choice]})}\n\n"
+
+        async def stream():
+            for i in range(n):
+                await asyncio.sleep(delay_ms / 1000)
+                yield chunk(f"tok{i} ")
+            yield chunk("", "length")
+            yield "data: [DONE]\n\n"
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay_ms * n / 1000)
+            text = "".join(f"tok{i} " for i in range(n))
+            return {"object": "text_completion", "choices": [{"index": 0, "text": text}]}
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--tokens", type=int, default=32)
+    parser.add_argument("--delay-ms", type=float, default=20.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    app = create_app(args.tokens, args.delay_ms, args.fail_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
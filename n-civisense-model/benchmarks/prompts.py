@@ -0,0 +1,18 @@
+"""Fixed set of real-world NIMC, FIRS and FRSC questions shared by the benchmarks.
+
+Every question is in scope for its context, so it always reaches the model.
+"""
+QUESTIONS = [
+    ("NIMC", "How do I get my NIN slip after enrolment?"),
+    ("NIMC", "Where is the nearest NIMC identity enrolment centre in Abuja?"),
+    ("NIMC", "I made a mistake in my date of birth on my NIN. How can I correct it and how much does it cost?"),
+    ("NIMC", "Yaya zan yi in sami katina na NIN?"),
+    ("FIRS", "How do I get a TIN for my small business?"),
+    ("FIRS", "When is the VAT return due each month and what is the penalty for filing late?"),
+    ("FIRS", "Do I need to pay company income tax if my business made a loss this year?"),
+    ("FIRS", "Bawo ni mo se le san owo tax mi lori ayelujara?"),
+    ("FRSC", "How do I renew my driver license?"),
+    ("FRSC", "What documents do I need to get a new plate number for my car?"),
+    ("FRSC", "My vehicle papers were stolen. How do I replace them and can I still drive meanwhile?"),
+    ("FRSC", "Kedu ka m ga-esi nweta driver license ohuru?"),
+]
@@ -0,0 +1,101 @@
+"""Per-query latency of the scope guardrail as the keyword list grows.
+
+Compares the original nested ``in`` / ``fuzz.partial_ratio`` loops with the
+compiled ScopeMatcher. Run from the n-civisense-model directory:
+
+    python -m benchmarks.scope_matcher --sizes 10,100,300,1000
+"""
+import argparse
+import json
+import random
+import string
+import time
+from typing import Dict, List
+
+from rapidfuzz import fuzz
+
+from scope import ScopeMatcher
+
+HIT_QUERIES = [
+    "How do I get my NIN slip reprinted?",
+    "What is the VAT rate for small businesses?",
+    "How to renew driver's license in Lagos",
+]
+MISS_QUERIES = [
+    "Who won the football match yesterday?",
+    "Recommend a good jollof rice recipe please",
+    "What is the weather like in Abuja today",
+]
+
+
+def nested_loops(text: str, keywords: Dict[str, List[str]]):
+    text_lower = text.lower()
+    matched, scores = [], []
+    for category, kws in keywords.items():
+        for kw in kws:
+            if kw in text_lower:
+                matched.append(f"{category}:{kw}")
+                scores.append(1.0)
+    if matched:
+        return True, list(set(matched)), 100.0
+    for category, kws in keywords.items():
+        for kw in kws:
+            score = fuzz.partial_ratio(kw, text_lower) / 100
+            if score >= 0.85:
+                matched.append(f"{category}:{kw}")
+                scores.append(score)
+    if matched:
+        return True, list(set(matched)), round(max(scores) * 100, 2)
+    return False, [], 0.0
+
+
+def make_keywords(size: int, rng: random.Random) -> Dict[str, List[str]]:
+    base = {
+        "NIMC": ["nin", "nimc", "identity"],
+        "FIRS": ["tax", "vat", "tin"],
+        "FRSC": ["driver", "license", "vehicle", "plate", "car"],
+    }
+    cats = list(base)
+    i = 0
+    while sum(len(v) for v in base.values()) < size:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randrange(5, 12)))
+        base[cats[i % 3]].append(word)
+        i += 1
+    return base
+
+
+def per_query_us(fn, queries: List[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in queries:
+            fn(q)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="11,50,100,300,1000")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    results = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        keywords = make_keywords(size, rng)
+        start = time.perf_counter()
+        matcher = ScopeMatcher(keywords)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        row = {"keywords": size, "build_ms": round(build_ms, 2)}
+        for label, queries in (("hit", HIT_QUERIES), ("miss", MISS_QUERIES)):
+            row[f"{label}_loops_us"] = round(
+                per_query_us(lambda q: nested_loops(q, keywords), queries, args.repeat), 1
+            )
+            row[f"{label}_compiled_us"] = round(per_query_us(matcher.match, queries, args.repeat), 1)
+        results.append(row)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
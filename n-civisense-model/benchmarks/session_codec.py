@@ -0,0 +1,82 @@
+"""Compare session codecs: encode/decode time and stored bytes per session.
+
+Run from the n-civisense-model directory:
+
+    python -m benchmarks.session_codec --sessions 500 --turns 12
+"""
+import argparse
+import json
+import random
+import time
+
+from codec import SessionCodec
+
+QUESTIONS = [
+    "How do I get my NIN if I lost my slip?",
+    "What documents do I need to register for a Tax Identification Number?",
+    "How can I renew my driver's license online and how long does it take?",
+    "Where is the nearest NIMC enrollment centre in Kano?",
+    "How do I file my VAT returns with FIRS?",
+    "What is the fine for driving without a valid plate number?",
+]
+ANSWERS = [
+    "You can retrieve your NIN by dialling *346# from the phone number used at enrollment, "
+    "or visit any NIMC enrollment centre with a valid means of identification.",
+    "To register for a TIN you need your certificate of incorporation or a valid ID, proof of "
+    "address and a completed application form, which you can submit on the FIRS portal.",
+    "Driver's license renewal starts on the FRSC portal: fill the renewal form, pay the fee, "
+    "then book a date for biometric capture at the licensing centre you selected.",
+]
+
+
+def make_session(turns: int, rng: random.Random):
+    msgs = []
+    for _ in range(turns):
+        q, a = rng.choice(QUESTIONS), rng.choice(ANSWERS)
+        msgs.append({"role": "user", "content": q, "tokens": len(q) // 4})
+        msgs.append({"role": "assistant", "content": a, "tokens": len(a) // 4})
+    return msgs
+
+
+def bench(name: str, sessions):
+    codec = SessionCodec(name)
+
+    start = time.perf_counter()
+    encoded = [[codec.encode(m) for m in msgs] for msgs in sessions]
+    encode_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for items in encoded:
+        for item in items:
+            codec.decode(item)
+    decode_s = time.perf_counter() - start
+
+    n = len(sessions)
+    return {
+        "codec": name,
+        "encode_us_per_session": round(encode_s / n * 1e6, 1),
+        "decode_us_per_session": round(decode_s / n * 1e6, 1),
+        "bytes_per_session": round(sum(len(i) for items in encoded for i in items) / n, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--codecs", default="json,msgpack,msgpack+zstd,msgpack+lz4")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sessions = [make_session(args.turns, rng) for _ in range(args.sessions)]
+
+    results = [bench(name, sessions) for name in args.codecs.split(",")]
+    baseline = results[0]["bytes_per_session"]
+    for r in results:
+        r["size_vs_first"] = round(r["bytes_per_session"] / baseline, 3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Event-loop responsiveness under N concurrent token streams.
+
+Each stream is fed by its own producer thread emitting tokens with a fixed
+delay, like a generation thread. A heartbeat task measures how late the loop
+wakes it up. ``blocking`` reproduces the old pattern of iterating a blocking
+queue (TextIteratorStreamer) inside the async generator; ``bridge`` uses
+TokenBridge. Run from the n-civisense-model directory:
+
+    python -m benchmarks.stream_loop_lag --streams 32 --max-lag-ms 20
+
+With --max-lag-ms the script exits non-zero if the bridge p99 lag exceeds it.
+"""
+import argparse
+import asyncio
+import json
+import queue
+import statistics
+import sys
+import threading
+import time
+
+from worker import TokenBridge
+
+HEARTBEAT_S = 0.005
+
+
+def produce(put, close, tokens: int, delay: float):
+    for i in range(tokens):
+        time.sleep(delay)
+        put(f"t{i} ")
+    close()
+
+
+async def blocking_stream(tokens: int, delay: float) -> int:
+    q: "queue.Queue" = queue.Queue()
+    done = object()
+    threading.Thread(target=produce, args=(q.put, lambda: q.put(done), tokens, delay)).start()
+    n = 0
+    while True:
+        tok = q.get()  # blocks the loop until the producer emits
+        if tok is done:
+            return n
+        n += 1
+        await asyncio.sleep(0)
+
+
+async def bridge_stream(tokens: int, delay: float) -> int:
+    bridge = TokenBridge()
+    threading.Thread(target=produce, args=(bridge.put, bridge.close, tokens, delay)).start()
+    n = 0
+    async for _ in bridge:
+        n += 1
+    return n
+
+
+async def heartbeat(lags, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_S)
+        lags.append((time.perf_counter() - start - HEARTBEAT_S) * 1000)
+
+
+async def run(mode: str, streams: int, tokens: int, delay: float):
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    stream = blocking_stream if mode == "blocking" else bridge_stream
+
+    start = time.perf_counter()
+    counts = await asyncio.gather(*[stream(tokens, delay) for _ in range(streams)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "streams": streams,
+        "tokens_per_s": round(sum(counts) / elapsed, 1),
+        "elapsed_s": round(elapsed, 3),
+        "heartbeats": len(lags),
+        "lag_p50_ms": round(statistics.median(lags), 2) if lags else None,
+        "lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 2) if lags else None,
+        "lag_max_ms": round(lags[-1], 2) if lags else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=16)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--delay-ms", type=float, default=10.0)
+    parser.add_argument("--modes", default="blocking,bridge")
+    parser.add_argument("--max-lag-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    results = [
+        asyncio.run(run(mode, args.streams, args.tokens, args.delay_ms / 1000))
+        for mode in args.modes.split(",")
+    ]
+    print(json.dumps(results, indent=2))
+
+    bridge = next((r for r in results if r["mode"] == "bridge"), None)
+    if args.max_lag_ms is not None and bridge and bridge["lag_p99_ms"] > args.max_lag_ms:
+        sys.exit(f"bridge p99 loop lag {bridge['lag_p99_ms']}ms exceeds {args.max_lag_ms}ms")
+
+
+if __name__ == "__main__":
+    main()
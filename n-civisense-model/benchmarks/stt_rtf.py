@@ -0,0 +1,84 @@
+"""Real-time factor of each STT backend on sample clips.
+
+RTF is transcription time divided by audio duration (lower is better; 0.1
+means ten seconds of audio transcribe in one second). Each clip is decoded
+once up front so only the engine is timed, and one untimed pass warms it up.
+Run from the n-civisense-model directory:
+
+    python -m benchmarks.stt_rtf --clips samples/*.wav --backends whisper faster-whisper
+
+Without --clips a synthetic 10 s clip (tone bursts and silence) is used, which
+exercises the decode path but says little about accuracy.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+
+from stt import SAMPLE_RATE, STT_BACKENDS, decode_audio, load_engine
+
+
+def synthetic_clip(seconds: float = 10.0) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    bursts = (np.sin(2 * np.pi * 0.5 * t) > 0).astype(np.float32)
+    return (0.3 * np.sin(2 * np.pi * 220 * t) * bursts).astype(np.float32)
+
+
+def run(backend: str, model: str, threads: int, clips, options) -> dict:
+    start = time.perf_counter()
+    engine = load_engine(backend, model, threads, **options)
+    load_s = time.perf_counter() - start
+    engine.transcribe(clips[0][1])
+
+    rows = []
+    for name, audio in clips:
+        start = time.perf_counter()
+        text = engine.transcribe(audio)
+        elapsed = time.perf_counter() - start
+        duration = len(audio) / SAMPLE_RATE
+        rows.append({
+            "clip": name,
+            "audio_s": round(duration, 2),
+            "elapsed_s": round(elapsed, 3),
+            "rtf": round(elapsed / duration, 4),
+            "text": text.strip()[:80],
+        })
+    return {
+        "backend": backend,
+        "model": model,
+        "threads": threads,
+        "load_s": round(load_s, 2),
+        "mean_rtf": round(statistics.mean(r["rtf"] for r in rows), 4),
+        "clips": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", nargs="*", default=[])
+    parser.add_argument("--backends", nargs="+", default=list(STT_BACKENDS), choices=STT_BACKENDS)
+    parser.add_argument("--model", default=os.getenv("WHISPER_MODEL", "base"))
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--compute-type", default=os.getenv("STT_COMPUTE_TYPE", "int8"))
+    parser.add_argument("--beam-size", type=int, default=int(os.getenv("STT_BEAM_SIZE", "1")))
+    parser.add_argument("--no-vad", action="store_true")
+    args = parser.parse_args()
+
+    if args.clips:
+        clips = []
+        for path in args.clips:
+            with open(path, "rb") as f:
+                clips.append((os.path.basename(path), decode_audio(f.read())))
+    else:
+        clips = [("synthetic-10s", synthetic_clip())]
+
+    options = dict(compute_type=args.compute_type, beam_size=args.beam_size, vad_filter=not args.no_vad)
+    results = [run(b, args.model, args.threads, clips, options) for b in args.backends]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import msgpack
+
+from metrics import CODEC_BYTES, CODEC_RATIO
+
+# Every encoded value starts with a version byte naming its format. Legacy
+# values are plain JSON text, which always starts with "{", "[" or '"'.
+RAW = 0x01
+ZSTD = 0x02
+LZ4 = 0x03
+LEGACY_JSON = (ord("{"), ord("["), ord('"'))
+
+
+def _zstd() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("SESSION_CODEC=msgpack+zstd requires the 'zstandard' package")
+    compressor = zstandard.ZstdCompressor(level=3)
+    decompressor = zstandard.ZstdDecompressor()
+    return compressor.compress, decompressor.decompress
+
+
+def _lz4() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    try:
+        import lz4.frame
+    except ImportError:
+        raise RuntimeError("SESSION_CODEC=msgpack+lz4 requires the 'lz4' package")
+    return lz4.frame.compress, lz4.frame.decompress
+
+
+class SessionCodec:
+    """Encodes session messages as versioned msgpack, optionally compressed.
+
+    ``decode`` understands every version byte plus legacy JSON text, so the
+    configured codec can change without migrating stored sessions. Payloads
+    shorter than ``min_compress`` bytes are stored uncompressed.
+    """
+
+    def __init__(self, name: str = "msgpack", min_compress: int = 128):
+        self.name = name
+        self.min_compress = min_compress
+        self._decompressors: Dict[int, Callable[[bytes], bytes]] = {}
+        self._compress: Optional[Callable[[bytes], bytes]] = None
+        self._version = RAW
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+        if name == "json":
+            self._version = None
+        elif name == "msgpack+zstd":
+            self._compress, self._decompressors[ZSTD] = _zstd()
+            self._version = ZSTD
+        elif name == "msgpack+lz4":
+            self._compress, self._decompressors[LZ4] = _lz4()
+            self._version = LZ4
+        elif name != "msgpack":
+            raise ValueError(f"Unknown session codec: {name}")
+
+    def encode(self, obj: Any) -> bytes:
+        if self._version is None:
+            data = json.dumps(obj).encode()
+            self._record(len(data), len(data))
+            return data
+
+        payload = msgpack.packb(obj, use_bin_type=True)
+        if self._compress is not None and len(payload) >= self.min_compress:
+            data = bytes([self._version]) + self._compress(payload)
+        else:
+            data = bytes([RAW]) + payload
+        self._record(len(payload), len(data))
+        return data
+
+    def decode(self, data: bytes) -> Any:
+        version = data[0]
+        if version in LEGACY_JSON:
+            return json.loads(data)
+        if version == RAW:
+            return msgpack.unpackb(data[1:], raw=False)
+
+        decompress = self._decompressors.get(version)
+        if decompress is None:
+            if version not in (ZSTD, LZ4):
+                raise ValueError(f"Unknown session codec version byte: {version:#x}")
+            decompress = (_zstd if version == ZSTD else _lz4)()[1]
+            self._decompressors[version] = decompress
+        return msgpack.unpackb(decompress(data[1:]), raw=False)
+
+    def _record(self, raw: int, stored: int):
+        self.raw_bytes += raw
+        self.stored_bytes += stored
+        CODEC_RATIO.labels(codec=self.name).set(self.raw_bytes / self.stored_bytes)
+        CODEC_BYTES.labels(codec=self.name, stage="raw").inc(raw)
+        CODEC_BYTES.labels(codec=self.name, stage="stored").inc(stored)
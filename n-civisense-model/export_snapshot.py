@@ -0,0 +1,29 @@
+"""Export a pre-quantized snapshot of the chat model for fast cold starts.
+
+Run once per model version (on a machine with the same bitsandbytes/CUDA
+stack as the service), then point MODEL_SNAPSHOT_DIR at the output:
+
+    python export_snapshot.py --out snapshots/n-atlas-bnb4
+"""
+import argparse
+import json
+import os
+import time
+
+from backends.transformers_backend import export_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "NCAIR1/N-ATLaS"))
+    parser.add_argument("--out", default=os.getenv("MODEL_SNAPSHOT_DIR") or "snapshots/n-atlas-bnb4")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    meta = export_snapshot(args.model, os.getenv("HF_TOKEN"), args.out)
+    meta["export_s"] = round(time.perf_counter() - start, 1)
+    print(json.dumps(meta, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import asyncio
+import resource
+import sys
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+class NotReady(Exception):
+    def __init__(self, name: str):
+        self.name = name
+        super().__init__(f"Model '{name}' is still loading")
+
+
+class ModelState:
+    def __init__(self):
+        self.status = "pending"  # pending -> loading -> warming -> ready | failed
+        self.load_s: Optional[float] = None
+        self.warmup_s: Optional[float] = None
+        self.error: Optional[str] = None
+        self.details: Dict = {}
+
+    def report(self) -> Dict:
+        return {
+            "status": self.status,
+            "load_s": self.load_s,
+            "warmup_s": self.warmup_s,
+            "error": self.error,
+            **self.details,
+        }
+
+
+class Readiness:
+    """Load state and timings for each model the service depends on.
+
+    ``run`` loads and warms one model and records how long each phase took;
+    a dict returned by ``load`` is added to that model's report.
+    Models are loaded concurrently in the background, so ``/health/live``
+    answers immediately while ``/health/ready`` and model-backed endpoints
+    wait for ``require``.
+    """
+
+    def __init__(self, *names: str):
+        self.started = time.monotonic()
+        self.models: Dict[str, ModelState] = {name: ModelState() for name in names}
+
+    async def run(
+        self,
+        name: str,
+        load: Callable[[], Awaitable],
+        warmup: Optional[Callable[[], Awaitable]] = None,
+    ):
+        state = self.models[name]
+        try:
+            state.status = "loading"
+            start = time.perf_counter()
+            details = await load()
+            state.details.update(details or {})
+            state.load_s = round(time.perf_counter() - start, 3)
+
+            if warmup is not None:
+                state.status = "warming"
+                start = time.perf_counter()
+                await warmup()
+                state.warmup_s = round(time.perf_counter() - start, 3)
+            state.status = "ready"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            state.status = "failed"
+            state.error = f"{type(e).__name__}: {e}"
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        states = [self.models[name]] if name else self.models.values()
+        return all(s.status == "ready" for s in states)
+
+    @property
+    def failed(self) -> bool:
+        return any(s.status == "failed" for s in self.models.values())
+
+    def require(self, name: str):
+        if not self.is_ready(name):
+            raise NotReady(name)
+
+    def report(self) -> Dict:
+        return {
+            "ready": self.is_ready(),
+            "uptime_s": round(time.monotonic() - self.started, 3),
+            "models": {name: s.report() for name, s in self.models.items()},
+        }
@@ -0,0 +1,86 @@
+from typing import Callable, Dict, List, Optional
+
+SUMMARY_ROLE = "summary"
+SUMMARY_HEADER = "Earlier in this conversation the user asked about:"
+
+Counter = Callable[[Dict], int]
+
+
+class PromptTooLong(ValueError):
+    def __init__(self, tokens: int, budget: int):
+        self.tokens = tokens
+        self.budget = budget
+        super().__init__(f"Message is {tokens} tokens; at most {budget} fit in the context window")
+
+
+def token_count(m: Dict, count: Counter) -> int:
+    """Token count of a message, computed once and cached on the message itself."""
+    if "tokens" not in m:
+        m["tokens"] = count(m)
+    return m["tokens"]
+
+
+def _question(text: str, max_words: int = 24) -> str:
+    words = text.split()
+    line = " ".join(words[:max_words])
+    return line + ("..." if len(words) > max_words else "")
+
+
+def summarize(
+    summary: Optional[Dict],
+    dropped: List[Dict],
+    count: Counter,
+    max_tokens: int,
+) -> Optional[Dict]:
+    """Fold dropped turns into the rolling summary, oldest lines falling off first."""
+    lines = summary["content"].split("\n")[1:] if summary else []
+    lines += [f"- {_question(m['content'])}" for m in dropped if m["role"] == "user"]
+
+    while lines:
+        m = {"role": SUMMARY_ROLE, "content": "\n".join([SUMMARY_HEADER] + lines)}
+        if token_count(m, count) <= max_tokens:
+            return m
+        lines.pop(0)
+    return None
+
+
+def fit_history(
+    msgs: List[Dict],
+    budget: int,
+    count: Counter,
+    summary_tokens: int = 256,
+    keep_ratio: float = 0.5,
+) -> List[Dict]:
+    """Keep the newest turns that fit ``budget`` tokens, compacting older ones.
+
+    When the history overflows, it is cut back to ``keep_ratio`` of the budget
+    rather than just under it, so compaction (which changes the prompt prefix
+    and invalidates the session KV cache) only happens every few turns.
+    Raises ``PromptTooLong`` if the newest message alone exceeds ``budget``.
+    """
+    total = sum(token_count(m, count) for m in msgs)
+    if total <= budget:
+        return msgs
+    if msgs[-1]["tokens"] > budget:
+        raise PromptTooLong(msgs[-1]["tokens"], budget)
+
+    summary = msgs[0] if msgs and msgs[0]["role"] == SUMMARY_ROLE else None
+    turns = msgs[1:] if summary else msgs
+    target = budget * keep_ratio - summary_tokens
+
+    kept, used = 0, 0
+    for m in reversed(turns):
+        if kept and used + m["tokens"] > target:
+            break
+        kept += 1
+        used += m["tokens"]
+
+    # Never open the window on an assistant reply without its question.
+    while kept > 1 and turns[-kept]["role"] != "user":
+        kept -= 1
+
+    dropped, turns = turns[:-kept], turns[-kept:]
+    summary = summarize(summary, dropped, count, summary_tokens)
+    if summary and summary["tokens"] + sum(m["tokens"] for m in turns) > budget:
+        summary = None  # only when one long message fills the window
+    return ([summary] if summary else []) + turns
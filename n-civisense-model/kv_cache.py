@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import torch
+from transformers.cache_utils import DynamicCache
+
+from metrics import (
+    KV_CACHE_BYTES,
+    KV_CACHE_ENTRIES,
+    KV_CACHE_HIT_RATIO,
+    KV_CACHE_LOOKUPS,
+    KV_CACHE_TOKENS_SAVED,
+)
+
+KV = List[Tuple[torch.Tensor, torch.Tensor]]
+
+
+# ==================== CACHE HELPERS ====================
+def cache_to_tuples(cache) -> KV:
+    if isinstance(cache, (tuple, list)):
+        return [(k, v) for k, v in cache]
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+def tuples_to_cache(kv: KV) -> DynamicCache:
+    if hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(tuple(kv))
+    return DynamicCache(kv)
+
+
+def crop(kv: KV, n: int) -> KV:
+    return [(k[:, :, :n], v[:, :, :n]) for k, v in kv]
+
+
+def kv_nbytes(kv: KV) -> int:
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in kv)
+
+
+def common_prefix(a: List[int], b: List[int]) -> int:
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+# ==================== PREFIX CACHE ====================
+class _Entry:
+    __slots__ = ("ids", "kv", "nbytes", "expires_at")
+
+    def __init__(self, ids: List[int], kv: KV, expires_at: Optional[float]):
+        self.ids = ids
+        self.kv = kv
+        self.nbytes = kv_nbytes(kv)
+        self.expires_at = expires_at
+
+
+class PrefixCache:
+    """LRU of ``past_key_values`` keyed by session, bounded by bytes and TTL.
+
+    Each entry remembers the token ids its KV covers, so a new prompt only
+    needs to prefill the tokens after the longest common prefix.
+    """
+
+    def __init__(self, name: str, max_bytes: int, ttl: Optional[float] = None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self.hits = 0
+        self.lookups = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def take(self, key: Hashable, ids: List[int]) -> Tuple[Optional[KV], int]:
+        """Remove and return the cached KV for ``key`` cropped to its overlap with ``ids``.
+
+        At least one prompt token is always left uncached so the caller still
+        gets logits for the next position.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._drop(entry)
+                if entry.expires_at is not None and entry.expires_at < time.monotonic():
+                    entry = None
+        self._publish()
+
+        reused = min(common_prefix(entry.ids, ids), len(ids) - 1) if entry else 0
+        self._record(reused)
+        if reused <= 0:
+            return None, 0
+        return crop(entry.kv, reused), reused
+
+    def put(self, key: Hashable, ids: List[int], kv: KV):
+        entry = _Entry(ids, kv, time.monotonic() + self.ttl if self.ttl else None)
+        if entry.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._drop(old)
+            self._entries[key] = entry
+            self.nbytes += entry.nbytes
+            self._shrink()
+        self._publish()
+
+    def evict(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._drop(entry)
+        self._publish()
+
+    def _drop(self, entry: _Entry):
+        self.nbytes -= entry.nbytes
+
+    def _shrink(self):
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if e.expires_at is not None and e.expires_at < now]:
+            self._drop(self._entries.pop(key))
+        while self.nbytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._drop(entry)
+
+    def _record(self, reused: int):
+        self.lookups += 1
+        self.hits += reused > 0
+        KV_CACHE_HIT_RATIO.labels(cache=self.name).set(self.hits / self.lookups)
+        KV_CACHE_LOOKUPS.labels(cache=self.name, result="hit" if reused > 0 else "miss").inc()
+        if reused > 0:
+            KV_CACHE_TOKENS_SAVED.labels(cache=self.name).inc(reused)
+
+    def _publish(self):
+        KV_CACHE_BYTES.labels(cache=self.name).set(self.nbytes)
+        KV_CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
+
+
+# ==================== STATIC PREFIX CACHE ====================
+class StaticPrefixCache:
+    """KV states for a fixed table of prompt prefixes, e.g. one system prompt per context.
+
+    Entries are shared read-only by every request and never evicted. ``stale``
+    returns the current table whenever it differs from the one that was last
+    loaded, so the model owner can rebuild the KV states.
+    """
+
+    def __init__(self, name: str, table: Callable[[], Dict[str, str]]):
+        self.name = name
+        self.table = table
+        self.nbytes = 0
+        self.hits = 0
+        self.lookups = 0
+        self._built: Optional[Dict[str, str]] = None
+        self._entries: List[Tuple[List[int], KV]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stale(self) -> Optional[Dict[str, str]]:
+        table = self.table()
+        return None if table == self._built else table
+
+    def load(self, table: Dict[str, str], entries: List[Tuple[List[int], KV]]):
+        self._entries = entries
+        self._built = dict(table)
+        self.nbytes = sum(kv_nbytes(kv) for _, kv in entries)
+        KV_CACHE_BYTES.labels(cache=self.name).set(self.nbytes)
+        KV_CACHE_ENTRIES.labels(cache=self.name).set(len(entries))
+
+    def match(self, ids: List[int]) -> Tuple[Optional[KV], int]:
+        """Return the longest cached prefix of ``ids``, leaving at least one token to prefill."""
+        best, reused = None, 0
+        for prefix_ids, kv in self._entries:
+            n = min(common_prefix(prefix_ids, ids), len(ids) - 1)
+            if n > reused:
+                best, reused = kv, n
+
+        self.lookups += 1
+        self.hits += reused > 0
+        KV_CACHE_HIT_RATIO.labels(cache=self.name).set(self.hits / self.lookups)
+        KV_CACHE_LOOKUPS.labels(cache=self.name, result="hit" if reused > 0 else "miss").inc()
+        if not reused:
+            return None, 0
+        KV_CACHE_TOKENS_SAVED.labels(cache=self.name).inc(reused)
+        return crop(best, reused), reused
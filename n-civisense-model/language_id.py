@@ -0,0 +1,150 @@
+"""Character n-gram language identifier for English, Hausa, Igbo and Yoruba.
+
+Profiles are naive Bayes log-probabilities of character 1-4 grams, trained
+offline from ``data/langid/train.tsv`` and stored as compact arrays in
+``data/langid/profiles.npz``. Rebuild them after editing the training set:
+
+    python -m language_id build
+    python -m language_id "Yaya zan yi in sami katina na NIN?"
+"""
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "langid")
+DEFAULT_PROFILE = os.path.join(DATA_DIR, "profiles.npz")
+ORDERS = (1, 2, 3, 4)
+# Known n-grams needed before a prediction can be fully trusted; about two short words.
+MIN_NGRAMS = 30
+
+_NON_LETTER = re.compile(r"[\W\d_]+")
+# Hooked letters have no decomposition, so plain-ASCII typing maps them by hand.
+_HOOKED = str.maketrans({"ƙ": "k", "ɗ": "d", "ɓ": "b", "ƴ": "y"})
+
+
+def normalize(text: str) -> str:
+    """Lowercase, NFC, letters only, padded with spaces to mark word edges."""
+    text = _NON_LETTER.sub(" ", unicodedata.normalize("NFC", text).lower())
+    return f" {' '.join(text.split())} "
+
+
+def fold(text: str) -> str:
+    """Strip tone marks and under-dots, as users typing without diacritics do."""
+    decomposed = unicodedata.normalize("NFD", text.translate(_HOOKED))
+    return unicodedata.normalize("NFC", "".join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+def ngrams(text: str, orders: Iterable[int] = ORDERS) -> List[str]:
+    return [text[i:i + n] for n in orders for i in range(len(text) - n + 1)]
+
+
+def read_tsv(path: str) -> List[Tuple[str, str]]:
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            label, text = line.rstrip("\n").split("\t", 1)
+            samples.append((label, text))
+    return samples
+
+
+class LanguageIdentifier:
+    """Scores a query against every language profile in one vectorised sum.
+
+    ``weights`` holds one row of per-language log-probabilities per known
+    n-gram; unknown n-grams are skipped. ``predict`` returns the best label
+    and its posterior probability, shrunk towards uniform when the query has
+    fewer than ``min_ngrams`` known n-grams: naive Bayes is over-confident
+    on a bare keyword or acronym, which is no evidence of a language.
+    """
+
+    def __init__(
+        self,
+        labels: List[str],
+        vocab: List[str],
+        weights: np.ndarray,
+        orders=ORDERS,
+        min_ngrams: int = MIN_NGRAMS,
+    ):
+        self.labels = list(labels)
+        self.orders = tuple(int(n) for n in orders)
+        self.min_ngrams = min_ngrams
+        self.index: Dict[str, int] = {g: i for i, g in enumerate(vocab)}
+        self.weights = weights.astype(np.float32)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PROFILE, min_ngrams: int = MIN_NGRAMS) -> "LanguageIdentifier":
+        with np.load(path) as data:
+            return cls(data["labels"].tolist(), data["vocab"].tolist(), data["weights"], data["orders"], min_ngrams)
+
+    def save(self, path: str = DEFAULT_PROFILE):
+        vocab = sorted(self.index, key=self.index.get)
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            vocab=np.array(vocab),
+            weights=self.weights.astype(np.float16),
+            orders=np.array(self.orders),
+        )
+
+    @classmethod
+    def train(
+        cls,
+        samples: List[Tuple[str, str]],
+        top_k: int = 3000,
+        alpha: float = 0.5,
+        orders=ORDERS,
+    ) -> "LanguageIdentifier":
+        labels = sorted({label for label, _ in samples})
+        counts = {label: Counter() for label in labels}
+        for label, text in samples:
+            counts[label].update(ngrams(normalize(text), orders))
+            folded = fold(text)
+            if folded != text:
+                counts[label].update(ngrams(normalize(folded), orders))
+
+        vocab = sorted({g for c in counts.values() for g, _ in c.most_common(top_k)})
+        weights = np.empty((len(vocab), len(labels)), dtype=np.float32)
+        for j, label in enumerate(labels):
+            c = counts[label]
+            total = sum(c[g] for g in vocab) + alpha * len(vocab)
+            weights[:, j] = np.log([(c[g] + alpha) / total for g in vocab])
+        return cls(labels, vocab, weights, orders)
+
+    def _rows(self, text: str) -> List[int]:
+        return [i for i in map(self.index.get, ngrams(normalize(text), self.orders)) if i is not None]
+
+    def scores(self, text: str) -> np.ndarray:
+        rows = self._rows(text)
+        if not rows:
+            return np.zeros(len(self.labels), dtype=np.float32)
+        return self.weights[rows].sum(axis=0)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        rows = self._rows(text)
+        scores = self.weights[rows].sum(axis=0) if rows else np.zeros(len(self.labels), dtype=np.float32)
+        probs = np.exp(scores - scores.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        evidence = min(1.0, len(rows) / self.min_ngrams)
+        return self.labels[best], float(evidence * probs[best] + (1 - evidence) / len(self.labels))
+
+
+def main():
+    if sys.argv[1:] == ["build"]:
+        identifier = LanguageIdentifier.train(read_tsv(os.path.join(DATA_DIR, "train.tsv")))
+        identifier.save()
+        print(f"{len(identifier.index)} n-grams x {len(identifier.labels)} languages -> {DEFAULT_PROFILE}")
+        return
+    identifier = LanguageIdentifier.load()
+    print(identifier.predict(" ".join(sys.argv[1:])))
+
+
+if __name__ == "__main__":
+    main()
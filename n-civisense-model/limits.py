@@ -0,0 +1,85 @@
+from contextlib import aclosing
+from typing import Tuple, Type
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+
+class UploadLimit:
+    """ASGI middleware capping request bodies on selected path prefixes.
+
+    A declared Content-Length over ``max_bytes`` is rejected before any body
+    is read; otherwise bytes are counted as they arrive and the request fails
+    with 413 as soon as the limit is crossed, so an oversized or chunked
+    upload is never buffered in full.
+    """
+
+    def __init__(self, app, max_bytes: int, prefixes: Tuple[str, ...] = ("/audio/",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.prefixes = prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and int(length) > self.max_bytes:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _detail(self) -> str:
+        return f"Upload exceeds {self.max_bytes} bytes"
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(status_code=413, content={"detail": self._detail()})
+        await response(scope, receive, send)
+
+
+def spooled_route(spool_max_size: int) -> Type[APIRoute]:
+    """Route class whose multipart uploads stay in memory up to ``spool_max_size`` bytes.
+
+    Starlette rolls uploaded files over to a temporary file after 1 MiB;
+    routes behind ``UploadLimit`` can keep everything they accept in memory.
+    """
+
+    class SpooledRequest(Request):
+        async def _get_form(self, **kwargs) -> FormData:
+            content_type = self.headers.get("content-type", "").lower()
+            if self._form is None and content_type.startswith("multipart/form-data"):
+                try:
+                    async with aclosing(self.stream()) as stream:
+                        parser = MultiPartParser(self.headers, stream, **kwargs)
+                        parser.spool_max_size = spool_max_size
+                        self._form = await parser.parse()
+                except MultiPartException as exc:
+                    raise HTTPException(status_code=400, detail=exc.message)
+            return await super()._get_form(**kwargs)
+
+    class SpooledRoute(APIRoute):
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+
+            async def spooled_handler(request: Request):
+                return await handler(SpooledRequest(request.scope, request.receive))
+
+            return spooled_handler
+
+    return SpooledRoute
@@ -0,0 +1,106 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# ==================== GENERATION ====================
+GENERATION_CANCELLED = Counter(
+    "generation_cancelled_total",
+    "Generations dropped because the client disconnected",
+)
+GENERATION_CANCELLED_TOKENS = Counter(
+    "generation_cancelled_tokens_total",
+    "Decode steps skipped by cancelled generations (max_new_tokens minus tokens generated)",
+)
+
+# ==================== KV CACHE ====================
+KV_CACHE_LOOKUPS = Counter(
+    "kv_cache_lookups_total",
+    "Prefix KV cache lookups by result",
+    ["cache", "result"],
+)
+KV_CACHE_HIT_RATIO = Gauge(
+    "kv_cache_hit_ratio",
+    "Share of prefix KV cache lookups that reused at least one token",
+    ["cache"],
+)
+KV_CACHE_TOKENS_SAVED = Counter(
+    "kv_cache_prefill_tokens_saved_total",
+    "Prompt tokens served from the prefix KV cache instead of being prefilled",
+    ["cache"],
+)
+KV_CACHE_BYTES = Gauge(
+    "kv_cache_bytes",
+    "Bytes of key/value tensors held by the prefix KV cache",
+    ["cache"],
+)
+KV_CACHE_ENTRIES = Gauge(
+    "kv_cache_entries",
+    "Entries held by the prefix KV cache",
+    ["cache"],
+)
+
+# ==================== REDIS ====================
+REDIS_LATENCY = Histogram(
+    "redis_op_seconds",
+    "Latency of session store operations against Redis",
+    ["op"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+REDIS_ERRORS = Counter(
+    "redis_errors_total",
+    "Session store operations that failed after retries",
+    ["op"],
+)
+REDIS_POOL_CONNECTIONS = Gauge(
+    "redis_pool_connections",
+    "Redis connection pool usage",
+    ["state"],
+)
+
+# ==================== SESSION CODEC ====================
+CODEC_BYTES = Counter(
+    "session_codec_bytes_total",
+    "Session payload bytes before (raw) and after (stored) compression",
+    ["codec", "stage"],
+)
+CODEC_RATIO = Gauge(
+    "session_codec_compression_ratio",
+    "Cumulative raw / stored byte ratio of encoded session payloads",
+    ["codec"],
+)
+
+# ==================== ANSWER CACHE ====================
+ANSWER_CACHE_LOOKUPS = Counter(
+    "answer_cache_lookups_total",
+    "First-turn answer cache lookups by context and result",
+    ["context", "result"],
+)
+
+# ==================== LATENCY ====================
+STAGE_LATENCY = Histogram(
+    "request_stage_seconds",
+    "Time spent in each stage of a request (scope, session_get, tokenize, queue_wait, prefill, ttft, ...)",
+    ["stage", "endpoint", "context"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+DECODE_TOKEN_SECONDS = Histogram(
+    "generation_decode_token_seconds",
+    "Mean time per generated token after the first, per generation",
+    ["endpoint", "context"],
+    buckets=(0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0),
+)
+GENERATION_TOKENS_PER_SECOND = Histogram(
+    "generation_tokens_per_second",
+    "Generated tokens per second of request time, queue and prefill included",
+    ["endpoint", "context"],
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200),
+)
+ACTIVE_GENERATIONS = Gauge(
+    "generation_active",
+    "Generations currently being streamed to a client",
+    ["endpoint", "context"],
+)
+STT_RTF = Histogram(
+    "stt_real_time_factor",
+    "Transcription time divided by audio duration",
+    ["endpoint", "context", "backend"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0),
+)
@@ -0,0 +1,400 @@
+import asyncio
+import queue
+import threading
+import time
+import warnings
+from typing import FrozenSet, Hashable, List, Optional, Sequence
+
+import torch
+
+from kv_cache import KV, PrefixCache, StaticPrefixCache, cache_to_tuples, tuples_to_cache
+from metrics import GENERATION_CANCELLED, GENERATION_CANCELLED_TOKENS
+from worker import DeadlineExceeded, Generation, Overloaded, match_stop
+
+
+def _pad_left(kv: KV, n: int) -> KV:
+    if n == 0:
+        return kv
+    out = []
+    for k, v in kv:
+        pad_k = k.new_zeros(k.shape[0], k.shape[1], n, k.shape[3])
+        pad_v = v.new_zeros(v.shape[0], v.shape[1], n, v.shape[3])
+        out.append((torch.cat([pad_k, k], dim=2), torch.cat([pad_v, v], dim=2)))
+    return out
+
+
+# ==================== SEQUENCE ====================
+class _Sequence(Generation):
+    def __init__(
+        self,
+        prompt_ids: List[int],
+        max_new_tokens: int,
+        temperature: float,
+        do_sample: bool,
+        deadline: Optional[float],
+        cache_key: Optional[Hashable],
+        loop: asyncio.AbstractEventLoop,
+        stop: Sequence[str] = (),
+        stop_ids: FrozenSet[int] = frozenset(),
+    ):
+        super().__init__(deadline, loop)
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.do_sample = do_sample
+        self.cache_key = cache_key
+        self.stop = tuple(stop)
+        self.stop_ids = stop_ids
+        self.generated: List[int] = []
+        self.next_token: Optional[int] = None
+        self.position = 0
+        # Incremental detokenization: ``decoded`` holds the reply so far,
+        # ``printed`` how much of it was streamed, and only
+        # ``generated[prefix_offset:]`` is decoded on each step.
+        self.decoded = ""
+        self.printed = 0
+        self.prefix_offset = 0
+        self.read_offset = 0
+        self.finished = False
+
+
+# ==================== SCHEDULER ====================
+class BatchScheduler:
+    """Continuous-batching decode loop shared by every chat request.
+
+    A single worker thread owns the model. New sequences are prefilled and
+    merged into the running batch at step boundaries; each decode step then
+    advances every active sequence by one token, and finished sequences are
+    dropped from the batch before the next step.
+    """
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        max_batch_size: int = 8,
+        max_queue: int = 32,
+        session_cache: Optional[PrefixCache] = None,
+        system_cache: Optional[StaticPrefixCache] = None,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.session_cache = session_cache
+        self.system_cache = system_cache
+        self.max_batch_size = max_batch_size
+        self.eos_ids = self._eos_ids()
+        self.top_k = getattr(model.generation_config, "top_k", None) or 50
+
+        self._waiting: "queue.Queue[_Sequence]" = queue.Queue(maxsize=max_queue)
+        self._active: List[_Sequence] = []
+        self._kv: Optional[KV] = None
+        self._mask: Optional[torch.Tensor] = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+
+    def _eos_ids(self) -> set:
+        eos = self.model.generation_config.eos_token_id
+        if eos is None:
+            eos = self.tokenizer.eos_token_id
+        if eos is None:
+            return set()
+        return set(eos) if isinstance(eos, (list, tuple)) else {eos}
+
+    @property
+    def device(self):
+        return self.model.device
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active)
+
+    @property
+    def waiting_count(self) -> int:
+        return self._waiting.qsize()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        try:
+            self._waiting.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=5)
+
+    # ---------- public API ----------
+    def submit(
+        self,
+        prompt_ids: List[int],
+        max_new_tokens: int = 128,
+        temperature: float = 1.0,
+        do_sample: bool = False,
+        timeout: Optional[float] = None,
+        cache_key: Optional[Hashable] = None,
+        stop: Sequence[str] = (),
+        stop_ids: FrozenSet[int] = frozenset(),
+    ) -> _Sequence:
+        """Queue a sequence for generation; iterate the result for text deltas.
+
+        Raises ``Overloaded`` straight away when the waiting queue is full, so
+        callers can reject the request before any response has been started.
+        With a ``cache_key`` the sequence reuses and then refreshes that key's
+        entry in the session KV cache. Generation ends at EOS, at any of
+        ``stop_ids`` or once the text reaches one of the ``stop`` strings,
+        which is not included in the output.
+        """
+        seq = _Sequence(
+            prompt_ids,
+            max_new_tokens,
+            temperature,
+            do_sample,
+            time.monotonic() + timeout if timeout else None,
+            cache_key,
+            asyncio.get_running_loop(),
+            stop,
+            stop_ids,
+        )
+        try:
+            self._waiting.put_nowait(seq)
+        except queue.Full:
+            raise Overloaded(self.waiting_count)
+        return seq
+
+    # ---------- worker thread ----------
+    def _run(self):
+        # Prefilling the system prompts runs model forward passes (and, on a
+        # GPU, kernel warm-up), so it happens here rather than on the event
+        # loop in start(). Requests queued meanwhile wait for it.
+        try:
+            self._refresh_system_prefixes()
+        except Exception as e:  # retried by the next prefill that misses the cache
+            warnings.warn(f"System prompt prefill failed ({e}); retrying on the next request")
+
+        while not self._stopped.is_set():
+            try:
+                self._admit()
+                if self._active:
+                    self._step()
+            except Exception as e:  # keep the worker alive, fail the batch
+                for seq in self._active:
+                    seq.bridge.fail(e)
+                self._active = []
+                self._kv = None
+                self._mask = None
+
+    def _admit(self):
+        while len(self._active) < self.max_batch_size:
+            try:
+                seq = self._waiting.get(block=not self._active)
+            except queue.Empty:
+                return
+            if seq is None:
+                return
+            if seq.cancelled:
+                self._cancel(seq)
+                continue
+            if seq.expired():
+                seq.bridge.fail(DeadlineExceeded())
+                continue
+            try:
+                self._prefill(seq)
+            except Exception as e:
+                seq.bridge.fail(e)
+
+    @torch.no_grad()
+    def _prefill(self, seq: _Sequence):
+        seq.started_at = time.perf_counter()
+        past, reused = None, 0
+        if self.session_cache is not None and seq.cache_key is not None:
+            past, reused = self.session_cache.take(seq.cache_key, seq.prompt_ids)
+        if not reused and self.system_cache is not None:
+            self._refresh_system_prefixes()
+            past, reused = self.system_cache.match(seq.prompt_ids)
+
+        ids = torch.tensor([seq.prompt_ids[reused:]], device=self.device)
+        out = self.model(
+            input_ids=ids,
+            past_key_values=tuples_to_cache(past) if past else None,
+            use_cache=True,
+        )
+        kv = cache_to_tuples(out.past_key_values)
+        seq.position = len(seq.prompt_ids)
+        seq.prefilled_at = time.perf_counter()
+
+        token = self._sample(out.logits[:, -1, :], [seq])[0]
+        if self._accept(seq, token):
+            self._store(seq, kv)
+            return
+
+        self._merge(seq, kv, torch.ones(1, seq.position, dtype=torch.long, device=self.device))
+
+    @torch.no_grad()
+    def _refresh_system_prefixes(self):
+        if self.system_cache is None:
+            return
+        table = self.system_cache.stale()
+        if table is None:
+            return
+
+        entries = []
+        for text in dict.fromkeys(table.values()):
+            ids = self.tokenizer(text)["input_ids"]
+            out = self.model(input_ids=torch.tensor([ids], device=self.device), use_cache=True)
+            entries.append((ids, cache_to_tuples(out.past_key_values)))
+        self.system_cache.load(table, entries)
+
+    def _merge(self, seq: _Sequence, kv: KV, mask: torch.Tensor):
+        if self._kv is None:
+            self._kv, self._mask, self._active = kv, mask, [seq]
+            return
+
+        cur_len, new_len = self._mask.shape[1], mask.shape[1]
+        length = max(cur_len, new_len)
+        batch_kv = _pad_left(self._kv, length - cur_len)
+        kv = _pad_left(kv, length - new_len)
+        self._kv = [
+            (torch.cat([bk, k], dim=0), torch.cat([bv, v], dim=0))
+            for (bk, bv), (k, v) in zip(batch_kv, kv)
+        ]
+        self._mask = torch.cat(
+            [
+                torch.nn.functional.pad(self._mask, (length - cur_len, 0)),
+                torch.nn.functional.pad(mask, (length - new_len, 0)),
+            ],
+            dim=0,
+        )
+        self._active.append(seq)
+
+    @torch.no_grad()
+    def _step(self):
+        for seq in self._active:
+            if seq.cancelled and not seq.finished:
+                self._cancel(seq)
+        self._evict()
+        if not self._active:
+            return
+
+        input_ids = torch.tensor([[s.next_token] for s in self._active], device=self.device)
+        position_ids = torch.tensor([[s.position] for s in self._active], device=self.device)
+        mask = torch.cat([self._mask, self._mask.new_ones(len(self._active), 1)], dim=1)
+
+        out = self.model(
+            input_ids=input_ids,
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=tuples_to_cache(self._kv),
+            use_cache=True,
+        )
+        self._kv = cache_to_tuples(out.past_key_values)
+        self._mask = mask
+
+        tokens = self._sample(out.logits[:, -1, :], self._active)
+        for seq, token in zip(self._active, tokens):
+            seq.position += 1
+            if not self._accept(seq, token) and seq.expired():
+                seq.finished = True
+                seq.bridge.fail(DeadlineExceeded())
+
+        self._evict()
+
+    def _sample(self, logits: torch.Tensor, seqs: List[_Sequence]) -> List[int]:
+        logits = logits.float()
+        greedy = logits.argmax(dim=-1)
+        if not any(s.do_sample for s in seqs):
+            return greedy.tolist()
+
+        temps = torch.tensor(
+            [max(s.temperature, 1e-5) for s in seqs], device=logits.device
+        ).unsqueeze(1)
+        scaled = logits / temps
+        k = min(self.top_k, scaled.shape[-1])
+        kth = torch.topk(scaled, k, dim=-1).values[:, -1:]
+        scaled = scaled.masked_fill(scaled < kth, float("-inf"))
+        sampled = torch.multinomial(torch.softmax(scaled, dim=-1), 1).squeeze(1)
+
+        return [
+            int(sampled[i]) if s.do_sample else int(greedy[i])
+            for i, s in enumerate(seqs)
+        ]
+
+    def _accept(self, seq: _Sequence, token: int) -> bool:
+        """Record a sampled token; returns True once the sequence is finished."""
+        if token in self.eos_ids or token in seq.stop_ids:
+            return self._finish(seq)
+
+        seq.generated.append(token)
+        seq.next_token = token
+        seq.count_token()
+
+        if len(seq.generated) >= seq.max_new_tokens:
+            return self._finish(seq)
+        if self._flush(seq):
+            seq.finished = True
+            seq.bridge.close()
+            return True
+        return False
+
+    def _flush(self, seq: _Sequence, final: bool = False) -> bool:
+        """Stream newly decoded text; returns True once it reaches a stop sequence."""
+        # Decoding the window from the previous read point keeps SentencePiece
+        # word-boundary spaces intact while touching only a few tokens.
+        prefix = self.tokenizer.decode(seq.generated[seq.prefix_offset:seq.read_offset], skip_special_tokens=True)
+        text = self.tokenizer.decode(seq.generated[seq.prefix_offset:], skip_special_tokens=True)
+        # Hold back incomplete multi-byte characters until the next token.
+        if len(text) > len(prefix) and (final or not text.endswith("\ufffd")):
+            seq.decoded += text[len(prefix):]
+            seq.prefix_offset, seq.read_offset = seq.read_offset, len(seq.generated)
+
+        end, stopped = match_stop(seq.decoded, seq.stop, seq.printed, hold=not final)
+        if end > seq.printed:
+            seq.bridge.put(seq.decoded[seq.printed:end])
+            seq.printed = end
+        return stopped
+
+    def _cancel(self, seq: _Sequence):
+        seq.finished = True
+        GENERATION_CANCELLED.inc()
+        GENERATION_CANCELLED_TOKENS.inc(seq.max_new_tokens - len(seq.generated))
+        seq.bridge.close()
+
+    def _finish(self, seq: _Sequence) -> bool:
+        self._flush(seq, final=True)
+        seq.finished = True
+        seq.bridge.close()
+        return True
+
+    def _row(self, i: int, length: int) -> KV:
+        start = self._mask.shape[1] - length
+        return [(k[i:i + 1, :, start:].clone(), v[i:i + 1, :, start:].clone()) for k, v in self._kv]
+
+    def _store(self, seq: _Sequence, kv: KV):
+        """Hand a finished sequence's KV back to the session cache for its next turn."""
+        if self.session_cache is None or seq.cache_key is None:
+            return
+        ids = (seq.prompt_ids + seq.generated)[:seq.position]
+        self.session_cache.put(seq.cache_key, ids, kv)
+
+    def _evict(self):
+        keep = [i for i, s in enumerate(self._active) if not s.finished]
+        if len(keep) == len(self._active):
+            return
+
+        for i, seq in enumerate(self._active):
+            if seq.finished:
+                self._store(seq, self._row(i, seq.position))
+
+        if not keep:
+            self._active, self._kv, self._mask = [], None, None
+            return
+
+        idx = torch.tensor(keep, device=self.device)
+        self._active = [self._active[i] for i in keep]
+        self._mask = self._mask.index_select(0, idx)
+        self._kv = [(k.index_select(0, idx), v.index_select(0, idx)) for k, v in self._kv]
+
+        # Drop leading columns that are padding for every remaining row.
+        trim = int((self._mask.sum(dim=0) == 0).long().cumprod(dim=0).sum())
+        if trim:
+            self._mask = self._mask[:, trim:]
+            self._kv = [(k[:, :, trim:], v[:, :, trim:]) for k, v in self._kv]
@@ -0,0 +1,83 @@
+import re
+from typing import Dict, List, Tuple
+
+from rapidfuzz import fuzz, process
+
+
+def trie_pattern(words: List[str]) -> str:
+    """Regex matching any of ``words``, factored as a character trie.
+
+    Shared prefixes are matched once, so the regex engine walks one branch
+    per character instead of retrying every alternative. Optional suffixes
+    are greedy, so the longest word at a position wins.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            return ("(?:" + body + ")?") if len(branches) == 1 else body + "?"
+        return body
+
+    return build(trie)
+
+
+class ScopeMatcher:
+    """Precompiled keyword matcher for the domain guardrail.
+
+    Exact hits use one trie-factored regex inside a lookahead, so every start
+    position in the query is tried once in C and yields the longest keyword
+    there. Keywords contained in that hit are added from a table built up
+    front, so the result equals testing ``kw in text`` for every keyword. On
+    a miss, fuzzy scores for all keywords come from one ``rapidfuzz.process``
+    call.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]], fuzzy_cutoff: float = 85.0):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.labels: Dict[str, List[str]] = {}
+        for category, kws in keywords.items():
+            for kw in kws:
+                self.labels.setdefault(kw.lower(), []).append(f"{category}:{kw}")
+
+        self.keywords = sorted(self.labels, key=len, reverse=True)
+        self.contained = {
+            kw: [other for other in self.keywords if other in kw] for kw in self.keywords
+        }
+        self.pattern = re.compile(f"(?=({trie_pattern(self.keywords)}))") if self.keywords else None
+
+    def match(self, text: str) -> Tuple[bool, List[str], float]:
+        if self.pattern is None:
+            return False, [], 0.0
+        text_lower = text.lower()
+
+        hits = set()
+        for m in self.pattern.finditer(text_lower):
+            hits.update(self.contained[m.group(1)])
+        if hits:
+            return True, self._labels(hits), 100.0
+
+        fuzzy = process.extract(
+            text_lower,
+            self.keywords,
+            scorer=fuzz.partial_ratio,
+            score_cutoff=self.fuzzy_cutoff,
+            limit=None,
+        )
+        if fuzzy:
+            best = max(score for _, score, _ in fuzzy) / 100
+            return True, self._labels(kw for kw, _, _ in fuzzy), round(best * 100, 2)
+
+        return False, [], 0.0
+
+    def _labels(self, kws) -> List[str]:
+        return list({label for kw in kws for label in self.labels[kw]})
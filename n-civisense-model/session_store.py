@@ -0,0 +1,167 @@
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import RedisError
+
+from codec import SessionCodec
+from history import SUMMARY_ROLE
+from metrics import REDIS_ERRORS, REDIS_LATENCY, REDIS_POOL_CONNECTIONS
+
+
+def create_redis(
+    url: Optional[str],
+    host: str,
+    port: int,
+    max_connections: int = 32,
+    timeout: float = 1.0,
+    retries: int = 2,
+) -> Redis:
+    """Async Redis client on a shared, bounded connection pool.
+
+    Commands time out after ``timeout`` seconds and connection/timeout errors
+    are retried with exponential backoff; waiting for a free pooled
+    connection is bounded by the same timeout.
+    """
+    kwargs = dict(
+        max_connections=max_connections,
+        timeout=timeout,
+        socket_timeout=timeout,
+        socket_connect_timeout=timeout,
+        retry=Retry(ExponentialBackoff(cap=0.5, base=0.02), retries),
+        decode_responses=False,
+    )
+    if url:
+        pool = BlockingConnectionPool.from_url(url, **kwargs)
+    else:
+        pool = BlockingConnectionPool(host=host, port=port, **kwargs)
+    return Redis(connection_pool=pool)
+
+
+@asynccontextmanager
+async def timed(client: Redis, op: str):
+    """Record latency, errors and pool usage for one Redis operation."""
+    start = time.perf_counter()
+    try:
+        yield
+    except RedisError:
+        REDIS_ERRORS.labels(op=op).inc()
+        raise
+    finally:
+        REDIS_LATENCY.labels(op=op).observe(time.perf_counter() - start)
+        _publish_pool(client)
+
+
+def _publish_pool(client: Redis):
+    pool = client.connection_pool
+    in_use = len(getattr(pool, "_in_use_connections", ()))
+    idle = len([c for c in getattr(pool, "_available_connections", ()) if c is not None])
+    REDIS_POOL_CONNECTIONS.labels(state="in_use").set(in_use)
+    REDIS_POOL_CONNECTIONS.labels(state="idle").set(idle)
+    REDIS_POOL_CONNECTIONS.labels(state="max").set(pool.max_connections)
+
+
+class SessionStore:
+    """Chat history per session as an append-only Redis list with a sliding TTL.
+
+    Turns live in ``session:{sid}`` (one encoded message per element) and the
+    rolling summary of compacted turns in ``session:{sid}:summary``. A turn
+    is an atomic RPUSH + LTRIM + EXPIRE, so writes cost O(new messages)
+    instead of rewriting the whole history. Sessions still stored as a
+    single JSON blob under the bare session id are migrated on first read.
+    Values go through ``codec``, which also reads plain JSON transparently.
+    """
+
+    def __init__(
+        self,
+        client: Redis,
+        ttl: int,
+        max_messages: int = 200,
+        codec: Optional[SessionCodec] = None,
+    ):
+        self.client = client
+        self.codec = codec or SessionCodec()
+        self.ttl = ttl
+        self.max_messages = max_messages
+
+    @staticmethod
+    def turns_key(sid: str) -> str:
+        return f"session:{sid}"
+
+    @staticmethod
+    def summary_key(sid: str) -> str:
+        return f"session:{sid}:summary"
+
+    async def get(self, sid: str, limit: Optional[int] = None) -> List[Dict]:
+        """Return ``[summary] + turns`` for the newest ``limit`` turns, refreshing the TTL."""
+        limit = limit or self.max_messages
+        turns_key, summary_key = self.turns_key(sid), self.summary_key(sid)
+
+        async with timed(self.client, "get"):
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.get(summary_key)
+                pipe.lrange(turns_key, -limit, -1)
+                pipe.expire(turns_key, self.ttl)
+                pipe.expire(summary_key, self.ttl)
+                pipe.get(sid)
+                summary, turns, _, _, legacy = await pipe.execute()
+
+        if legacy and not turns:
+            return await self._migrate(sid, self.codec.decode(legacy), limit)
+
+        msgs = [self.codec.decode(m) for m in turns]
+        return ([self.codec.decode(summary)] if summary else []) + msgs
+
+    async def append(
+        self,
+        sid: str,
+        msgs: List[Dict],
+        keep: Optional[int] = None,
+        summary: Optional[Dict] = None,
+    ):
+        """Atomically append ``msgs`` and trim the list to the newest ``keep`` turns.
+
+        ``summary`` replaces the stored rolling summary when history was compacted.
+        """
+        turns_key, summary_key = self.turns_key(sid), self.summary_key(sid)
+        keep = min(keep or self.max_messages, self.max_messages)
+
+        async with timed(self.client, "append"):
+            async with self.client.pipeline(transaction=True) as pipe:
+                if msgs:
+                    pipe.rpush(turns_key, *[self.codec.encode(m) for m in msgs])
+                pipe.ltrim(turns_key, -keep, -1)
+                if summary is not None:
+                    pipe.set(summary_key, self.codec.encode(summary), ex=self.ttl)
+                pipe.expire(turns_key, self.ttl)
+                pipe.expire(summary_key, self.ttl)
+                await pipe.execute()
+
+    async def _migrate(self, sid: str, msgs: List[Dict], limit: int) -> List[Dict]:
+        """Move a legacy JSON-blob session into the list layout in one transaction."""
+        summary = msgs[0] if msgs and msgs[0]["role"] == SUMMARY_ROLE else None
+        turns = (msgs[1:] if summary else msgs)[-self.max_messages:]
+        turns_key, summary_key = self.turns_key(sid), self.summary_key(sid)
+
+        async with timed(self.client, "migrate"):
+            async with self.client.pipeline(transaction=True) as pipe:
+                if turns:
+                    pipe.rpush(turns_key, *[self.codec.encode(m) for m in turns])
+                    pipe.expire(turns_key, self.ttl)
+                if summary is not None:
+                    pipe.set(summary_key, self.codec.encode(summary), ex=self.ttl)
+                pipe.delete(sid)
+                await pipe.execute()
+
+        return ([summary] if summary else []) + turns[-limit:]
+
+    async def clear(self, sid: str):
+        async with timed(self.client, "clear"):
+            await self.client.delete(self.turns_key(sid), self.summary_key(sid), sid)
+
+    async def close(self):
+        await self.client.aclose()
+        await self.client.connection_pool.disconnect()
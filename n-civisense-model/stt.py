@@ -0,0 +1,342 @@
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from worker import DeadlineExceeded, Overloaded
+
+SAMPLE_RATE = 16000
+
+
+class AudioDecodeError(ValueError):
+    pass
+
+
+class WorkerCrashed(RuntimeError):
+    """A worker process died; the pool must be started again."""
+
+
+def decode_audio(data: bytes, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode any ffmpeg-readable audio to mono float32 PCM, piping through memory."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr),
+        "pipe:1",
+    ]
+    proc = subprocess.run(cmd, input=data, capture_output=True)
+    if proc.returncode != 0:
+        raise AudioDecodeError(f"Failed to decode audio: {proc.stderr.decode(errors='replace')[-200:]}")
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+# ==================== ENGINES ====================
+STT_BACKENDS = ("whisper", "faster-whisper")
+
+
+class WhisperEngine:
+    """Reference PyTorch Whisper."""
+
+    def __init__(self, model_name: str, threads: int):
+        import torch
+        import whisper
+
+        torch.set_num_threads(threads)
+        self.fp16 = torch.cuda.is_available()
+        self.model = whisper.load_model(model_name)
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        return self.model.transcribe(audio, fp16=self.fp16)["text"]
+
+
+class FasterWhisperEngine:
+    """CTranslate2 Whisper (``faster-whisper``), int8 on CPU by default."""
+
+    def __init__(
+        self,
+        model_name: str,
+        threads: int,
+        device: str = "cpu",
+        compute_type: str = "int8",
+        beam_size: int = 1,
+        vad_filter: bool = True,
+    ):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("STT_BACKEND=faster-whisper requires the 'faster-whisper' package")
+
+        self.beam_size = beam_size
+        self.vad_filter = vad_filter
+        self.model = WhisperModel(
+            model_name,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=threads,
+            num_workers=1,
+        )
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        segments, _ = self.model.transcribe(
+            audio,
+            beam_size=self.beam_size,
+            vad_filter=self.vad_filter,
+        )
+        # Segments are generated lazily; joining them runs the decode.
+        return "".join(seg.text for seg in segments)
+
+
+def load_engine(backend: str, model_name: str, threads: int, **options):
+    if backend == "whisper":
+        return WhisperEngine(model_name, threads)
+    if backend == "faster-whisper":
+        return FasterWhisperEngine(model_name, threads, **options)
+    raise ValueError(f"Unknown STT_BACKEND {backend!r}; expected one of {', '.join(STT_BACKENDS)}")
+
+
+# ---------- worker process ----------
+_engine = None
+_all_loaded = None
+
+
+def _init_process(all_loaded, initializer: Callable, initargs: Tuple):
+    global _all_loaded
+    _all_loaded = all_loaded
+    initializer(*initargs)
+
+
+def _init_worker(backend: str, model_name: str, threads: int, options: Dict):
+    global _engine
+    _engine = load_engine(backend, model_name, threads, **options)
+
+
+def _wait_loaded(timeout: Optional[float]) -> int:
+    # A worker holding this job takes no other, so one job lands on each
+    # worker and none returns before every worker has run its initializer.
+    _all_loaded.wait(timeout)
+    return os.getpid()
+
+
+def _transcribe(data: Union[bytes, np.ndarray, None]) -> Dict:
+    start = time.perf_counter()
+    if isinstance(data, np.ndarray):
+        audio = data
+    elif data is None:  # warmup job: one second of silence
+        audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    else:
+        audio = decode_audio(data)
+    text = _engine.transcribe(audio)
+    return {
+        "text": text,
+        "audio_s": len(audio) / SAMPLE_RATE,
+        "elapsed_s": time.perf_counter() - start,
+    }
+
+
+class WhisperPool:
+    """Whisper models in a pool of worker processes.
+
+    ``backend`` picks the engine (``whisper`` or ``faster-whisper``; extra
+    ``options`` go to its constructor). Each process loads its own model and gets ``cpu_count // workers`` torch
+    threads, so concurrent uploads transcribe in parallel instead of queueing
+    behind one model. Uploads are passed as bytes and decoded inside the
+    worker by piping them through ffmpeg; nothing touches the disk. At most
+    ``max_queue`` jobs may be pending or running before ``Overloaded``. If
+    a worker process dies the executor is unusable: it is shut down and
+    every job fails with ``WorkerCrashed`` until ``start`` is called again.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "whisper",
+        workers: int = 2,
+        max_queue: int = 8,
+        **options,
+    ):
+        if backend not in STT_BACKENDS:
+            raise ValueError(f"Unknown STT_BACKEND {backend!r}; expected one of {', '.join(STT_BACKENDS)}")
+        self.model_name = model_name
+        self.backend = backend
+        self.options = options
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.pending = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._spawn(_init_worker, (self.backend, self.model_name, threads, self.options))
+
+    def _spawn(self, initializer: Callable, initargs: Tuple):
+        # Forking a process that already holds torch/CUDA state is unsafe.
+        ctx = multiprocessing.get_context("spawn")
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_process,
+            initargs=(ctx.Barrier(self.workers), initializer, initargs),
+        )
+
+    async def wait_loaded(self, timeout: Optional[float] = None):
+        """Start every worker process and wait until each has loaded its model."""
+        jobs = [self._pool.submit(_wait_loaded, timeout) for _ in range(self.workers)]
+        await asyncio.gather(*[asyncio.wrap_future(job) for job in jobs])
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def warmup(self, timeout: Optional[float] = None):
+        """Run a silent transcription per worker before traffic arrives."""
+        await asyncio.gather(*[self.transcribe(None, timeout) for _ in range(self.workers)])
+
+    async def transcribe(
+        self,
+        data: Union[bytes, np.ndarray, None],
+        timeout: Optional[float] = None,
+    ) -> Dict:
+        """Transcribe encoded audio bytes or 16 kHz float32 samples.
+
+        Besides ``text`` the result carries ``audio_s`` (clip length),
+        ``elapsed_s`` (decode and transcribe time inside the worker) and
+        ``wall_s`` (including time queued for a free worker).
+        """
+        pool = self._pool
+        if pool is None:
+            raise WorkerCrashed("Whisper pool is not running")
+        if self.pending >= self.max_queue:
+            raise Overloaded(self.pending)
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            fut = pool.submit(_transcribe, data)
+            # On timeout a still-queued job is cancelled; a running one finishes in its worker.
+            result = await asyncio.wait_for(asyncio.wrap_future(fut), timeout)
+            result["wall_s"] = time.perf_counter() - start
+            return result
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded()
+        except BrokenProcessPool as e:
+            # Every job in flight fails at once; the first one retires the pool.
+            if self._pool is pool:
+                self.stop()
+            raise WorkerCrashed(f"Whisper worker process died: {e}")
+        finally:
+            self.pending -= 1
+
+
+# ==================== STREAMING ====================
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+
+class SpeechSegmenter:
+    """Energy-based voice activity detection over a live 16 kHz PCM stream.
+
+    Audio is cut into ``frame_ms`` frames; a frame is speech when its RMS is
+    above ``threshold`` and three times the running noise floor. A segment
+    opens on the first speech frame (with ``preroll_ms`` of lead-in) and
+    closes after ``silence_ms`` of silence or ``max_segment_s`` of audio.
+    Segments with less than ``min_speech_ms`` of speech are dropped.
+    Segments are returned as ``(segment_id, samples)``.
+    """
+
+    def __init__(
+        self,
+        sr: int = SAMPLE_RATE,
+        frame_ms: int = 30,
+        threshold: float = 0.01,
+        silence_ms: int = 600,
+        preroll_ms: int = 200,
+        min_speech_ms: int = 250,
+        max_segment_s: float = 15.0,
+        partial_every_s: float = 1.0,
+    ):
+        self.frame = sr * frame_ms // 1000
+        self.threshold = threshold
+        self.silence_frames = silence_ms // frame_ms
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = int(max_segment_s * 1000 / frame_ms)
+        self.partial_frames = int(partial_every_s * 1000 / frame_ms)
+
+        self.noise = threshold
+        self.remainder = np.zeros(0, dtype=np.float32)
+        self.preroll: Deque[np.ndarray] = deque(maxlen=max(1, preroll_ms // frame_ms))
+        self.current: List[np.ndarray] = []
+        self.speech = 0
+        self.silence = 0
+        self.since_partial = 0
+        self.index = 0  # id of the open (or next) segment
+
+    @property
+    def active(self) -> bool:
+        return bool(self.current)
+
+    def feed(self, pcm: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        """Add samples; return any segments that closed."""
+        audio = np.concatenate([self.remainder, pcm]) if len(self.remainder) else pcm
+        n = len(audio) // self.frame * self.frame
+        self.remainder = audio[n:]
+
+        done = []
+        for frame in audio[:n].reshape(-1, self.frame):
+            segment = self._frame(frame)
+            if segment is not None:
+                done.append(segment)
+        return done
+
+    def flush(self) -> List[Tuple[int, np.ndarray]]:
+        """Close the open segment at end of stream."""
+        segment = self._close()
+        return [segment] if segment is not None else []
+
+    def partial(self) -> Optional[Tuple[int, np.ndarray]]:
+        """The open segment so far, once ``partial_every_s`` of new audio arrived."""
+        if not self.current or self.since_partial < self.partial_frames:
+            return None
+        self.since_partial = 0
+        return self.index, np.concatenate(self.current)
+
+    def _frame(self, frame: np.ndarray) -> Optional[Tuple[int, np.ndarray]]:
+        rms = float(np.sqrt(np.mean(frame * frame)))
+        is_speech = rms > max(self.threshold, 3 * self.noise)
+
+        if not self.current:
+            if not is_speech:
+                self.noise = 0.95 * self.noise + 0.05 * rms
+                self.preroll.append(frame)
+                return None
+            self.current = list(self.preroll)
+            self.preroll.clear()
+
+        self.current.append(frame)
+        self.since_partial += 1
+        if is_speech:
+            self.speech += 1
+            self.silence = 0
+        else:
+            self.silence += 1
+
+        if self.silence >= self.silence_frames or len(self.current) >= self.max_frames:
+            return self._close()
+        return None
+
+    def _close(self) -> Optional[Tuple[int, np.ndarray]]:
+        segment = None
+        if self.speech >= self.min_speech_frames:
+            segment = self.index, np.concatenate(self.current)
+        if self.current:
+            self.index += 1
+        self.current = []
+        self.speech = self.silence = self.since_partial = 0
+        return segment
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+
+
+# ==================== ERRORS ====================
+class Overloaded(Exception):
+    def __init__(self, queue_depth: int):
+        self.queue_depth = queue_depth
+        super().__init__(f"Inference queue is full ({queue_depth} waiting)")
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, message: str = "Inference deadline exceeded"):
+        super().__init__(message)
+
+
+# ==================== TOKEN BRIDGE ====================
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_CLOSED = object()
+
+
+class TokenBridge:
+    """Hands items from a producer thread to an asyncio consumer.
+
+    The producer never touches the queue directly: every ``put`` is scheduled
+    onto the loop with ``call_soon_threadsafe``, so neither side blocks the
+    other and any number of bridges can be consumed concurrently.
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop or asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    # ---------- producer (any thread) ----------
+    def put(self, item: Any):
+        try:
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:  # loop already closed, nobody is listening
+            pass
+
+    def close(self):
+        self.put(_CLOSED)
+
+    def fail(self, error: BaseException):
+        self.put(_Failure(error))
+
+    # ---------- consumer (event loop) ----------
+    async def batches(self) -> AsyncIterator[List[Any]]:
+        """Yield every item that is ready at once, so a slow consumer catches up in one step."""
+        while True:
+            items = [await self._queue.get()]
+            while not self._queue.empty():
+                items.append(self._queue.get_nowait())
+
+            for i, item in enumerate(items):
+                if item is _CLOSED or isinstance(item, _Failure):
+                    if i:
+                        yield items[:i]
+                    if item is _CLOSED:
+                        return
+                    raise item.error
+            yield items
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        async for items in self.batches():
+            for item in items:
+                yield item
+
+
+# ==================== GENERATION ====================
+def match_stop(text: str, stop: Sequence[str], start: int = 0, hold: bool = True) -> Tuple[int, bool]:
+    """Where streamed ``text`` may be cut given stop sequences.
+
+    Returns ``(end, True)`` with ``end`` at the first stop sequence at or
+    after ``start``. Otherwise returns ``(end, False)``: with ``hold``,
+    ``text[end:]`` is the start of a stop sequence that the next token may
+    complete, so it must not be sent yet.
+    """
+    if not stop:
+        return len(text), False
+    hits = [i for i in (text.find(s, start) for s in stop) if i >= 0]
+    if hits:
+        return min(hits), True
+    if hold:
+        for n in range(min(len(text) - start, max(map(len, stop)) - 1), 0, -1):
+            if any(s.startswith(text[-n:]) for s in stop):
+                return len(text) - n, False
+    return len(text), False
+
+
+class Generation:
+    """Handle to one in-flight generation, shared by every inference backend.
+
+    Iterate it for text deltas or await ``text()`` for the whole reply. The
+    producing thread feeds ``bridge`` and checks ``cancelled``/``expired()``
+    between tokens. It also stamps when work started, when the prompt was
+    prefilled and when tokens were produced (``time.perf_counter``), which
+    the API turns into per-stage latency metrics.
+    """
+
+    def __init__(self, deadline: Optional[float], loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.deadline = deadline
+        self.cancelled = False
+        self.bridge = TokenBridge(loop)
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.prefilled_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.tokens = 0
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def cancel(self):
+        """Ask the producer to stop at the next token boundary."""
+        self.cancelled = True
+
+    def count_token(self):
+        self.last_token_at = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = self.last_token_at
+        self.tokens += 1
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        # Text deltas that piled up while the consumer was busy arrive as one chunk.
+        async for chunks in self.bridge.batches():
+            yield "".join(chunks)
+
+    async def text(self) -> str:
+        return "".join([t async for t in self])
+